@@ -0,0 +1,175 @@
+# Batch runner: plays thousands of seeded headless games across every CPU core
+#
+# Each game is driven by a policy and its outcome (level, score, lives lost by cause, what ended the game,
+# boss time-to-kill) is streamed to a JSON Lines file as soon as it finishes; a summary line closes the file.
+#
+#   python batch_runner.py --games 2000 --out results.jsonl                 # autopilot, all cores
+#   python batch_runner.py --games 500 --policy camper --workers 4          # another built-in policy
+#   python batch_runner.py --games 500 --policy my_bots:dodger              # any function(seed) -> policy(state)
+#   python batch_runner.py --games 500 --set WAVE_GROWTH=4 BOSS_HEALTH_STEP=8000   # try other difficulty settings
+import os  # OS module for environment variables and CPU count
+import sys  # for error messages
+import json  # for the results file
+import time  # for throughput
+import random  # for the random policy
+import argparse  # for command line options
+import importlib  # for loading policies from other modules
+import multiprocessing  # for the process pool
+
+# Workers only simulate: no window, video or sound
+os.environ["SPACE_DIDDLER_HEADLESS"] = "1"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np  # for percentiles
+import pyGame as game  # The game being simulated
+
+
+# Policy: nothing but the autopilot (chase the lowest enemy, always firing)
+def autopilot_policy(seed):
+    return game.autopilot
+
+
+# Policy: stay put at the starting position and keep firing
+def camper_policy(seed):
+    inputs = game.NO_INPUTS._replace(shoot=True)
+    return lambda state: inputs._replace(super=state.player.super_move_ready)
+
+
+# Policy: mash random keys (seeded separately, so the game's own random numbers are untouched)
+def random_policy(seed):
+    rng = random.Random(seed)
+    return lambda state: game.INPUTS_BY_BYTE[rng.getrandbits(8) & 0b01111111]  # Never Enter
+
+
+# Every built-in policy by name; each takes the game's seed and returns a function from GameState to Inputs
+POLICIES = {
+    "autopilot": autopilot_policy,
+    "camper": camper_policy,
+    "random": random_policy,
+}
+
+
+# Function to find a policy by name, or as module:function for policies kept elsewhere
+def load_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module_name, _, function_name = name.partition(":")
+    if not function_name:
+        raise ValueError(f"unknown policy {name!r} (expected one of {', '.join(POLICIES)} or module:function)")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+# Function to parse the --set difficulty overrides
+def parse_settings(pairs):
+    settings = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        if not hasattr(game.GameState, key) or not key.isupper():
+            raise ValueError(f"unknown difficulty setting {key!r}")
+        settings[key] = type(getattr(game.GameState, key))(value)  # Same type as the default
+    return settings
+
+
+policy_factory = None  # Policy of this worker process, set by init_worker
+
+
+# Function run once in every worker process
+def init_worker(policy_name, settings):
+    global policy_factory
+    policy_factory = load_policy(policy_name)
+    for key, value in settings.items():
+        setattr(game.GameState, key, value)
+
+
+# Function to play one game in a worker and describe how it went
+def play_game(job):
+    seed, max_ticks = job
+    start = time.perf_counter()
+    state = game.run_headless(seed, max_ticks, policy_factory(seed))
+    return {
+        "type": "game",
+        "seed": seed,
+        "level": state.level,
+        "score": state.score,
+        "ticks": state.tick,
+        "finished": state.game_over,  # False when max_ticks stopped the game first
+        "death_cause": state.death_cause,
+        "lives_lost": state.lives_lost,
+        "boss_kills": [{"level": level, "ticks": ticks} for level, ticks in state.boss_kills],
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+# Function to combine the per-game results into one summary
+def summarize(games, elapsed, workers):
+    levels = np.array([result["level"] for result in games])
+    scores = np.array([result["score"] for result in games])
+    ticks = sum(result["ticks"] for result in games)
+
+    lives_lost = {}
+    death_causes = {}
+    boss_ticks = {}  # Boss level -> ticks to kill it, across games
+    for result in games:
+        for cause, count in result["lives_lost"].items():
+            lives_lost[cause] = lives_lost.get(cause, 0) + count
+        cause = result["death_cause"] or "survived"
+        death_causes[cause] = death_causes.get(cause, 0) + 1
+        for kill in result["boss_kills"]:
+            boss_ticks.setdefault(kill["level"], []).append(kill["ticks"])
+
+    def spread(values):
+        p10, p50, p90 = np.percentile(values, [10, 50, 90])
+        return {"mean": round(float(np.mean(values)), 2), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+    return {
+        "type": "summary",
+        "games": len(games),
+        "workers": workers,
+        "level": spread(levels),
+        "score": spread(scores),
+        "lives_lost": lives_lost,
+        "death_causes": death_causes,
+        "boss_ticks_to_kill": {str(level): spread(ticks) | {"kills": len(ticks)} for level, ticks in sorted(boss_ticks.items())},
+        "seconds": round(elapsed, 2),
+        "games_per_second": round(len(games) / elapsed, 2),
+        "ticks_per_second": round(ticks / elapsed),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many seeded headless Space Diddler games in parallel")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game (game n uses seed + n)")
+    parser.add_argument("--policy", default="autopilot", help=f"{', '.join(POLICIES)} or module:function")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: one per CPU)")
+    parser.add_argument("--max-ticks", type=int, default=60 * 60 * 30, help="stop a game after this many ticks")
+    parser.add_argument("--chunksize", type=int, default=4, help="games handed to a worker at a time")
+    parser.add_argument("--set", nargs="+", default=[], metavar="NAME=VALUE",
+                        help="difficulty overrides, e.g. WAVE_GROWTH=4 POWER_UP_CHANCE=0.3 BOSS_BASE_HEALTH=20000")
+    parser.add_argument("--out", default="batch_results.jsonl", help="JSON Lines file for the results")
+    args = parser.parse_args()
+
+    try:
+        load_policy(args.policy)  # Fail here rather than in every worker
+        settings = parse_settings(args.set)
+    except (ValueError, ImportError, AttributeError) as error:
+        sys.exit(f"batch_runner: {error}")
+
+    jobs = [(args.seed + number, args.max_ticks) for number in range(args.games)]
+    games = []
+    start = time.perf_counter()
+    with open(args.out, "w") as out_file, multiprocessing.Pool(args.workers, init_worker, (args.policy, settings)) as pool:
+        for result in pool.imap_unordered(play_game, jobs, chunksize=args.chunksize):
+            out_file.write(json.dumps(result) + "\n")  # Stream each game as it finishes
+            games.append(result)
+            if len(games) % 100 == 0:
+                print(f"{len(games)}/{args.games} games, {len(games) / (time.perf_counter() - start):.1f} games/s")
+        summary = summarize(games, time.perf_counter() - start, args.workers)
+        summary["policy"] = args.policy
+        summary["settings"] = settings
+        out_file.write(json.dumps(summary) + "\n")
+
+    print(f"{summary['games']} games in {summary['seconds']} s on {args.workers} workers "
+          f"({summary['games_per_second']} games/s, {summary['ticks_per_second']} ticks/s)")
+    print(f"level p50 {summary['level']['p50']:.0f} (p10 {summary['level']['p10']:.0f}, p90 {summary['level']['p90']:.0f}), "
+          f"score p50 {summary['score']['p50']:.0f}, deaths {summary['death_causes']}")
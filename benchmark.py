@@ -0,0 +1,242 @@
+# Frame-time benchmarks for Space Diddler
+#
+# Runs scripted, seeded scenarios on SDL's dummy video and audio drivers and reports
+# frame and update time percentiles, allocations per frame and peak memory as JSON.
+#
+#   python benchmark.py --out results.json              # run every scenario
+#   python benchmark.py --baseline results.json         # run again and compare with a saved run
+#   python benchmark.py --scenarios level1 boss5        # run only some scenarios
+#   python benchmark.py --replay late_game.sdr          # also run a recorded replay (see pyGame.py --record)
+import os  # OS module for environment variables and paths
+import sys  # for the Python executable and allocation counters
+import gc  # for garbage collector statistics
+import json  # for machine-readable results
+import time  # for timing frames
+import argparse  # for command line options
+import platform  # for recording the machine the results came from
+import subprocess  # for running each scenario in a fresh process
+import tempfile  # for passing results back from the scenario processes
+
+try:
+    import resource  # Peak memory on Linux and macOS
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Run without a real window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np  # for percentiles
+import pygame  # Pygame for the display update
+import pyGame as game  # The game being measured
+
+
+# Function to start a background video decoder for a scenario
+def start_video(path):
+    decoder = game.VideoDecoder(game.open_background_video(path))  # Own capture so scenarios don't share a playhead
+    decoder.start()
+    return decoder
+
+
+# Scenario: the main menu with its background video
+def menu_scenario(seed):
+    decoder = start_video(game.menu_video_path)
+
+    def draw():
+        game.draw_menu(game.WIN, decoder.next_frame())
+
+    return (lambda: None), draw, decoder.stop
+
+
+# Scenario: the game from a given level, driven by the autopilot
+def game_scenario(seed, level=1, saturate=False):
+    state = game.GameState(seed)
+    state.level = level - 1  # spawn_wave() moves to the next level
+    state.wave_length = 5 * level  # Wave size the ramp would have reached by then
+    state.spawn_wave()
+    decoder = start_video(game.game_video_path)
+
+    def update():
+        if saturate:  # Every ship fires as often as it can
+            state.player.cool_down_counter = 0
+            for enemy in state.enemies:
+                enemy.cool_down_counter = 0
+                enemy.shoot()
+        state.step(game.autopilot(state))
+
+    def draw():
+        game.draw_game(game.WIN, state, decoder.next_frame())
+
+    return update, draw, decoder.stop
+
+
+# Scenario: a recorded game, played back from its first tick
+def replay_scenario(path):
+    replay = game.Replay(path)
+    state = game.GameState(replay.seed)
+    decoder = start_video(game.game_video_path)
+
+    def update():
+        if not state.game_over:  # Keep drawing the final state if the replay is shorter than the run
+            state.step(replay.policy(state))
+
+    def draw():
+        game.draw_game(game.WIN, state, decoder.next_frame())
+
+    return update, draw, decoder.stop
+
+
+# Every scenario by name
+SCENARIOS = {
+    "menu": menu_scenario,
+    "level1": lambda seed: game_scenario(seed, level=1),
+    "level40": lambda seed: game_scenario(seed, level=40),  # About 200 enemies
+    "boss5": lambda seed: game_scenario(seed, level=5),
+    "boss10": lambda seed: game_scenario(seed, level=10),
+    "laser_field": lambda seed: game_scenario(seed, level=10, saturate=True),
+}
+
+
+# Function to summarize a list of timings in milliseconds
+def percentiles(samples):
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50": round(p50, 4), "p95": round(p95, 4), "p99": round(p99, 4), "mean": round(float(np.mean(samples)), 4)}
+
+
+# Function to measure one scenario in this process
+def run_scenario(name, frames, warmup, seed):
+    update, draw, cleanup = SCENARIOS[name](seed)
+    frame_ms = []  # Update + draw + display update, per frame
+    update_ms = []  # Game logic only, per frame
+    draw_ms = []  # Layer blits only, per frame (see pyGame.LayerRenderer)
+    draw_calls = []  # Blit calls on the window, per frame
+    net_blocks = 0  # Allocated memory blocks gained while measuring
+    gen0_before = 0  # Young-generation collections before measuring
+
+    for frame in range(warmup + frames):
+        if frame == warmup:  # Start counting after the warm-up frames
+            gen0_before = gc.get_stats()[0]["collections"]
+            blocks_before = sys.getallocatedblocks()
+        start = time.perf_counter()
+        update()
+        updated = time.perf_counter()
+        draw()
+        pygame.display.update()
+        end = time.perf_counter()
+        if frame >= warmup:
+            frame_ms.append((end - start) * 1000)
+            update_ms.append((updated - start) * 1000)
+            if name != "menu":  # The menu doesn't use the layered renderer
+                draw_ms.append(game.RENDERER.draw_ms)
+                draw_calls.append(game.RENDERER.draw_calls)
+
+    net_blocks = sys.getallocatedblocks() - blocks_before
+    gen0 = gc.get_stats()[0]["collections"] - gen0_before
+    cleanup()
+
+    peak_rss_mb = None
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Kilobytes on Linux, bytes on macOS
+        peak_rss_mb = round(peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+    return {
+        "frames": frames,
+        "frame_ms": percentiles(frame_ms),
+        "update_ms": percentiles(update_ms),
+        "draw_ms": percentiles(draw_ms) if draw_ms else None,
+        "draw_calls_per_frame": round(float(np.mean(draw_calls)), 2) if draw_calls else None,
+        "net_alloc_blocks_per_frame": round(net_blocks / frames, 2),  # Growth in live objects (leaks show up here)
+        "gc_gen0_per_1k_frames": round(gen0 * 1000 / frames, 2),  # Young collections: a proxy for allocation churn
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+# Function to measure one scenario in a fresh process (so peak memory is per scenario)
+def run_isolated(name, frames, warmup, seed, replay=None):
+    with tempfile.TemporaryDirectory() as folder:
+        result_path = os.path.join(folder, "result.json")
+        command = [sys.executable, os.path.abspath(__file__), "--run-one", name, "--frames", str(frames),
+                   "--warmup", str(warmup), "--seed", str(seed), "--result-file", result_path]
+        if replay:
+            command += ["--replay", os.path.abspath(replay)]
+        subprocess.run(command, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        with open(result_path) as result_file:
+            return json.load(result_file)
+
+
+# Function to compare results with a saved baseline
+def compare(results, baseline, threshold):
+    """Print the change of every timing percentile and return the number of regressions."""
+    regressions = 0
+    print(f"{'scenario':<12} {'metric':<16} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, result in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old is None:
+            continue
+        for metric in ("frame_ms", "update_ms"):
+            for stat in ("p50", "p95", "p99"):
+                before, after = old[metric][stat], result[metric][stat]
+                change = (after - before) / before if before else 0.0
+                flag = " <-- slower" if change > threshold else ""
+                regressions += change > threshold
+                print(f"{name:<12} {metric + ' ' + stat:<16} {before:>10.3f} {after:>10.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Space Diddler frame-time benchmarks")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS),
+                        help="scenarios to run (default: all)")
+    parser.add_argument("--frames", type=int, default=600, help="measured frames per scenario")
+    parser.add_argument("--warmup", type=int, default=60, help="unmeasured frames before measuring")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for every scenario")
+    parser.add_argument("--replay", help="also run this replay file as the 'replay' scenario (its own seed is used)")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression (0.10 = 10%%)")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)  # Used internally to run one scenario per process
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.replay:
+        SCENARIOS["replay"] = lambda seed: replay_scenario(args.replay)
+        if "replay" not in args.scenarios:
+            args.scenarios.append("replay")
+
+    if args.run_one:  # Child process: measure one scenario and hand back the result
+        result = run_scenario(args.run_one, args.frames, args.warmup, args.seed)
+        with open(args.result_file, "w") as result_file:
+            json.dump(result, result_file)
+        raise SystemExit
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "frames": args.frames,
+            "warmup": args.warmup,
+            "replay": args.replay,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        result = run_isolated(name, args.frames, args.warmup, args.seed, args.replay)
+        results["scenarios"][name] = result
+        print(f"{name:<12} frame p50 {result['frame_ms']['p50']:.2f} ms  p95 {result['frame_ms']['p95']:.2f} ms  "
+              f"p99 {result['frame_ms']['p99']:.2f} ms  update p50 {result['update_ms']['p50']:.2f} ms  "
+              f"peak {result['peak_rss_mb']} MB")
+
+    if args.out:
+        with open(args.out, "w") as out_file:
+            json.dump(results, out_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        if regressions:
+            print(f"{regressions} timing(s) slower than the baseline by more than {args.threshold:.0%}")
+            raise SystemExit(1)
@@ -0,0 +1,93 @@
+# Asset build step: packs every registered sprite, already scaled, into one atlas image
+#
+# Writes assets/atlas.png (the sprites), assets/atlas.json (where each sprite is, and what it was built from)
+# and assets/atlas_masks.bin (each sprite's collision mask, one bit per pixel). The game loads those three
+# files instead of decoding, scaling and masking every PNG; rerun this after changing or adding a sprite.
+#
+#   python build_atlas.py                   # build the atlas
+#   python build_atlas.py --check           # exit with status 1 if the atlas is missing or out of date
+import os  # OS module for paths and environment variables
+import sys  # for the exit status
+import json  # for the manifest
+import argparse  # for command line options
+
+# Build without a window or sound (a display is still needed to convert the sprites)
+os.environ["SPACE_DIDDLER_HEADLESS"] = "1"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np  # for packing the masks
+import pygame  # Pygame for loading, scaling and saving the images
+import pyGame as game  # The game whose assets are packed
+
+
+# Function to load one sprite the way the game does without an atlas
+def load_sprite(name):
+    filename, size = game.ASSETS.specs[name]
+    image = pygame.image.load(os.path.join(game.ASSETS.folder, filename))
+    if size is not None:
+        image = pygame.transform.scale(image, size)
+    return image.convert_alpha()
+
+
+# Function to place the sprites on shelves, tallest first
+def pack(sizes, width, padding=1):
+    """Return {name: (x, y)} and the atlas height for sprites of the given {name: (width, height)}."""
+    positions = {}
+    x = y = shelf_height = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], -item[1][0])):
+        if x + w > width:  # Shelf full: start the next one
+            x, y, shelf_height = 0, y + shelf_height + padding, 0
+        positions[name] = (x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+    return positions, y + shelf_height
+
+
+# Function to write the atlas, its manifest and its masks
+def build(folder, width):
+    sprites = {name: load_sprite(name) for name in game.ASSETS.specs}
+    width = max(width, *(image.get_width() for image in sprites.values()))
+    positions, height = pack({name: image.get_size() for name, image in sprites.items()}, width)
+
+    atlas = pygame.Surface((width, height), pygame.SRCALPHA)  # Transparent where no sprite is
+    manifest = {"version": game.ATLAS_VERSION, "image": "atlas.png", "masks": "atlas_masks.bin", "sprites": {}}
+    masks = bytearray()
+    for name, image in sprites.items():
+        x, y = positions[name]
+        atlas.blit(image, (x, y))
+        bits = pygame.surfarray.array_alpha(image).T > 127  # Same threshold as pygame.mask.from_surface
+        packed = np.packbits(bits, axis=1, bitorder="little").tobytes()  # Rows of bits, first pixel in the lowest bit
+        filename, size = game.ASSETS.specs[name]
+        manifest["sprites"][name] = {
+            "file": filename,
+            "size": list(size) if size is not None else None,
+            **game.atlas_source_stamp(os.path.join(folder, filename)),  # To notice a changed source
+            "rect": [x, y, image.get_width(), image.get_height()],
+            "mask_offset": len(masks),
+        }
+        masks += packed
+
+    pygame.image.save(atlas, os.path.join(folder, manifest["image"]))
+    with open(os.path.join(folder, manifest["masks"]), "wb") as masks_file:
+        masks_file.write(masks)
+    with open(os.path.join(folder, game.ATLAS_MANIFEST), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    return width, height, len(sprites)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack the Space Diddler sprites into one atlas")
+    parser.add_argument("--width", type=int, default=1024, help="atlas width (widened to fit the widest sprite)")
+    parser.add_argument("--check", action="store_true", help="only check that the atlas is up to date")
+    args = parser.parse_args()
+
+    folder = game.ASSETS.folder
+    if args.check:
+        stale = sorted(set(game.ASSETS.specs) - set(game.ASSETS.atlas_sprites()))
+        if stale:
+            sys.exit(f"build_atlas: out of date for {', '.join(stale)} (run python build_atlas.py)")
+        print("Atlas is up to date")
+        raise SystemExit
+
+    width, height, count = build(folder, args.width)
+    print(f"Packed {count} sprites into a {width}x{height} atlas in {folder}/")
@@ -1,9 +1,30 @@
 # Import the necessary libraries
 import pygame  # Pygame for game development (graphics, sound, etc.)
 import os  # OS module for file path handling        
+import argparse  # for command line options
+import sys  # for checking the command line before pygame starts
 import random  # for random number generation
 import cv2  # for video manipulation
-
+import numpy as np  # for array-backed entity storage
+import threading  # for decoding the background video on a worker thread
+import mmap  # for memory-mapping the raw video frame cache
+import struct  # for the video frame cache header
+import time  # for timing asset loads and frame phases
+import json  # for Chrome trace export
+import hashlib  # for noticing changed atlas sources
+import contextlib  # for the no-op profiler phase
+import sqlite3  # for the leaderboard and session telemetry
+import queue  # for handing sessions to the score writer thread
+from collections import deque, OrderedDict, namedtuple  # ring buffer for video frames, LRU sprite caches, projectile templates
+
+
+# Headless mode: run the game logic without a real window, video or sound
+HEADLESS = "--headless" in sys.argv or os.environ.get("SPACE_DIDDLER_HEADLESS") == "1"
+# No-video mode: draw a static background instead of the videos, and only update the parts of the screen that change
+NO_VIDEO = HEADLESS or "--no-video" in sys.argv or os.environ.get("SPACE_DIDDLER_NO_VIDEO") == "1"
+if HEADLESS:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Off-screen display (still needed to convert sprites)
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")  # No sound device
 
 # Load and set the game icon
 icon_path = os.path.join("assets", "ship1.png")  # Path to your icon image
@@ -12,7 +33,8 @@ pygame.display.set_icon(icon_image)
 
 # Initialize pygame's font and mixer `modules`
 pygame.font.init()  # Initialize the font module for text rendering
-pygame.mixer.init()  # Initialize the mixer module for sound playback
+if not HEADLESS:
+    pygame.mixer.init()  # Initialize the mixer module for sound playback
 
 # Set up the display window dimensions
 WIDTH, HEIGHT = 1000, 650  # Define window width and height
@@ -23,19 +45,230 @@ pygame.display.set_caption("Space Diddler")  # Set the title of the game window
 game_video_path = os.path.join("assets", "background_video3.mp4")  # Define path to the game background video
 menu_video_path = os.path.join("assets", "background_video3.mp4")  # Define path to the menu background video
 
-# Capture the videos for gameplay and menu background
-game_cap = cv2.VideoCapture(game_video_path)  # Load game video
-menu_cap = cv2.VideoCapture(menu_video_path)  # Load menu video
+# Stand-in for sounds when running headless
+class SilentSound:
+    def play(self):
+        pass  # Nothing to play without a mixer
 
 # Load sound effects and music
-LASER_HIT_SOUND = pygame.mixer.Sound(os.path.join("assets", "laserhit.wav"))  # Sound for laser hit
-SPECIAL_ATTACK_SOUND = pygame.mixer.Sound(os.path.join("assets", "specialLaser.wav"))  # Sound for special attack
+if HEADLESS:
+    LASER_HIT_SOUND = SPECIAL_ATTACK_SOUND = SilentSound()  # No audio in headless mode
+else:
+    LASER_HIT_SOUND = pygame.mixer.Sound(os.path.join("assets", "laserhit.wav"))  # Sound for laser hit
+    SPECIAL_ATTACK_SOUND = pygame.mixer.Sound(os.path.join("assets", "specialLaser.wav"))  # Sound for special attack
+
+# Sound effects go through a fixed pool of mixer channels, merged and voice-limited per frame
+class SoundDispatcher:
+    def __init__(self, channels=6):
+        self.channel_count = channels  # Size of the channel pool
+        self.channels = None  # Mixer channels (created on the first flush, once the mixer is up)
+        self.voices = {}  # Channel index -> (sound name, priority, start order) of what it is playing
+        self.sounds = {}  # Sound name -> (sound, priority, most voices at once)
+        self.requests = set()  # Sounds asked for since the last flush
+        self.started = 0  # Voices started, for telling which one is oldest
+
+        # Counters for reporting
+        self.played = 0  # Sounds started on a channel
+        self.merged = 0  # Requests folded into one already made this frame
+        self.dropped = 0  # Requests with no channel or voice to spare
+        self.stolen = 0  # Voices cut off for a higher-priority sound
+
+    def register(self, name, sound, priority=0, max_voices=2):
+        self.sounds[name] = (sound, priority, max_voices)
+
+    def play(self, name):
+        """Ask for a sound this frame (the same sound asked for twice plays once)."""
+        if not pygame.mixer.get_init():  # No mixer (headless, batch runs): nothing would ever flush it
+            return
+        if name in self.requests:
+            self.merged += 1
+        else:
+            self.requests.add(name)
+
+    def flush(self):
+        """Start this frame's sounds, highest priority first."""
+        if not self.requests:
+            return
+        requests = sorted(self.requests, key=lambda name: -self.sounds[name][1])
+        self.requests.clear()
+        if not pygame.mixer.get_init():  # No mixer (headless): nothing to play
+            return
+        if self.channels is None:
+            if pygame.mixer.get_num_channels() < self.channel_count:
+                pygame.mixer.set_num_channels(self.channel_count)
+            self.channels = [pygame.mixer.Channel(index) for index in range(self.channel_count)]
+
+        for name in requests:
+            sound, priority, max_voices = self.sounds[name]
+            busy = {index: voice for index, voice in self.voices.items() if self.channels[index].get_busy()}
+            self.voices = busy  # Forget voices that have finished
+            if sum(voice[0] == name for voice in busy.values()) >= max_voices:  # Enough of this sound already playing
+                self.dropped += 1
+                continue
+
+            free = [index for index in range(self.channel_count) if index not in busy]
+            if free:
+                index = free[0]
+            else:  # Every channel busy: take the oldest, lowest-priority voice if it matters less
+                index = min(busy, key=lambda index: (busy[index][1], busy[index][2]))
+                if busy[index][1] >= priority:
+                    self.dropped += 1
+                    continue
+                self.channels[index].stop()
+                self.stolen += 1
+
+            self.channels[index].play(sound)
+            self.voices[index] = (name, priority, self.started)
+            self.started += 1
+            self.played += 1
+
+    def clear(self):
+        """Forget sounds asked for but not played (a scene ended before its next flush)."""
+        self.requests.clear()
+
+    def stats(self):
+        return {"played": self.played, "merged": self.merged, "dropped": self.dropped, "stolen": self.stolen}
+
+
+SOUNDS = SoundDispatcher()  # Sound effects for every scene
+SOUNDS.register("laser_hit", LASER_HIT_SOUND, priority=0, max_voices=3)  # Frequent and short: a few voices are enough
+SOUNDS.register("special_attack", SPECIAL_ATTACK_SOUND, priority=10, max_voices=1)  # Rare: always gets a channel
+
 MENU_MUSIC = os.path.join("assets", "menuMusic.wav")  # Background music for menu
 GAME_MUSIC = os.path.join("assets", "FrierentheSlayer.wav")  # Background music for game (same as menu)
 
+# Frame profiler: times each phase of a frame for an on-screen overlay and offline analysis
+PROFILE_PHASES = ("tick", "events", "update", "spawn", "enemies", "boss", "player_lasers", "power_ups",
+                  "video", "draw", "hud", "sprites", "tint", "blits", "overlay", "display")  # CSV columns, in order
+PROFILE_COUNTS = ("enemies", "player_lasers", "enemy_lasers", "boss_lasers", "power_ups",
+                  "draw_calls", "sprites_drawn", "culled")  # Entity and renderer counts per frame
+NULL_PHASE = contextlib.nullcontext()  # Returned when profiling is off so timing costs nothing
+
+
+class ProfilePhase:
+    """Context manager that records how long one phase of the frame took."""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.events.append((self.name, self.start, time.perf_counter() - self.start))
+
+
+class FrameProfiler:
+    """Per-phase frame timer with a toggleable overlay and CSV or Chrome-trace export."""
+
+    def __init__(self, history=120):
+        self.enabled = False  # When False, phase() returns NULL_PHASE and end_frame() does nothing
+        self.overlay_visible = False  # Whether draw_overlay() shows anything
+        self.events = []  # (phase, start, seconds) recorded this frame
+        self.history = deque(maxlen=history)  # (frame seconds, {phase: seconds}) for recent frames
+        self.counts = {}  # Entity counts of the last frame
+        self.frame_start = 0.0  # perf_counter() when the current frame started
+        self.frame_index = 0  # Frames recorded so far
+        self.output = None  # Open CSV or trace file
+        self.output_format = None  # "csv" or "trace"
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            self.frame_start = time.perf_counter()
+
+    def toggle_overlay(self):
+        """Show or hide the overlay (profiling starts the first time it is shown)."""
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.enable()
+
+    def phase(self, name):
+        """Return a context manager timing the phase called name."""
+        if not self.enabled:
+            return NULL_PHASE
+        return ProfilePhase(self, name)
+
+    def open_output(self, path):
+        """Stream every frame to path: Chrome trace JSON if it ends in .json, CSV otherwise."""
+        self.enable()
+        self.output = open(path, "w")
+        if path.endswith(".json"):
+            self.output_format = "trace"
+            self.output.write("[\n")  # Chrome accepts a trace array without the closing bracket
+        else:
+            self.output_format = "csv"
+            self.output.write(",".join(("frame", "scene", "frame_ms") + tuple(f"{name}_ms" for name in PROFILE_PHASES) + PROFILE_COUNTS) + "\n")
+
+    def end_frame(self, scene, counts=None):
+        """Finish the current frame: store its phases and write them to the output file."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        frame_time = now - self.frame_start
+        totals = {}
+        for name, _, seconds in self.events:
+            totals[name] = totals.get(name, 0.0) + seconds
+        self.history.append((frame_time, totals))
+        self.counts = counts or {}
+
+        if self.output_format == "csv":
+            row = [str(self.frame_index), scene, f"{frame_time * 1000:.3f}"]
+            row += [f"{totals.get(name, 0.0) * 1000:.3f}" for name in PROFILE_PHASES]
+            row += [str(self.counts.get(name, 0)) for name in PROFILE_COUNTS]
+            self.output.write(",".join(row) + "\n")
+        elif self.output_format == "trace":
+            events = [{"name": scene, "ph": "X", "ts": self.frame_start * 1e6, "dur": frame_time * 1e6,
+                       "pid": 1, "tid": 1, "args": self.counts}]
+            events += [{"name": name, "ph": "X", "ts": start * 1e6, "dur": seconds * 1e6, "pid": 1, "tid": 1}
+                       for name, start, seconds in self.events]
+            self.output.write("".join(json.dumps(event) + ",\n" for event in events))
+
+        self.events = []
+        self.frame_index += 1
+        self.frame_start = now
+
+    def draw_overlay(self, window):
+        """Draw rolling averages, spikes and entity counts in the top-left corner."""
+        if not self.overlay_visible or not self.history:
+            return
+        with self.phase("overlay"):
+            frame_times = [frame_time for frame_time, _ in self.history]
+            average = sum(frame_times) / len(frame_times)
+            spikes = sum(frame_time > 2 * average for frame_time in frame_times)  # Frames twice as slow as usual
+            lines = [f"frame {average * 1000:5.2f} ms avg  {max(frame_times) * 1000:5.2f} ms max  {spikes} spikes"]
+            for name in PROFILE_PHASES:
+                samples = [totals.get(name, 0.0) for _, totals in self.history]
+                if any(samples):
+                    lines.append(f"{name:<14}{sum(samples) / len(samples) * 1000:6.2f} avg {max(samples) * 1000:6.2f} max")
+            lines.append("  ".join(f"{name} {count}" for name, count in self.counts.items()))
+
+            font = get_font("consolas", 18)
+            panel = pygame.Surface((430, 20 * len(lines) + 10), pygame.SRCALPHA)  # Translucent background
+            panel.fill((0, 0, 0, 170))
+            for row, line in enumerate(lines):
+                panel.blit(font.render(line, 1, (255, 255, 0)), (6, 5 + 20 * row))
+            return window.blit(panel, (10, 60))  # Area covered, for dirty-rect updates
+
+    def close(self):
+        if self.output is not None:
+            if self.output_format == "trace":
+                self.output.write("{}]\n")  # Empty event so the array ends without a trailing comma
+            self.output.close()
+            self.output = None
+
+
+PROFILER = FrameProfiler()  # Shared by every scene; disabled unless asked for
+
+
 # Function to retrieve frames from a video
-def get_video_frame(cap, skip_frames=1):
-    """Extract a frame from the video and convert it to a pygame surface."""
+def get_video_frame(cap, skip_frames=1, scale=1):
+    """Extract a frame from the video and convert it to a pygame surface (converted at 1/scale size, then scaled up)."""
+    if isinstance(cap, CachedVideo):  # Frames from the raw cache are already window-sized RGB
+        return cap.next_surface(skip_frames)
+
     for _ in range(skip_frames):  # Skip frames to control playback speed
         ret, frame = cap.read()  # Read a frame from the video
         if not ret:  # If no frame is returned (end of video), reset to the beginning
@@ -43,12 +276,363 @@ def get_video_frame(cap, skip_frames=1):
             ret, frame = cap.read()  # Read the first frame again
 
     # Resize the frame to fit the game window
-    frame = cv2.resize(frame, (WIDTH, HEIGHT))  # Resize the video frame to window size
+    frame = cv2.resize(frame, (WIDTH // scale, HEIGHT // scale))  # Resize the video frame to window size (or a fraction of it)
     frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # Convert frame from BGR to RGB
     frame_surface = pygame.surfarray.make_surface(frame_rgb.swapaxes(0, 1))  # Create pygame surface from the frame
+    if scale > 1:
+        frame_surface = pygame.transform.scale(frame_surface, (WIDTH, HEIGHT))  # Back up to window size
 
     return frame_surface  # Return the pygame surface
-    
+
+
+# Raw frame cache: the background video pre-transcoded to window-sized RGB frames in one file
+VIDEO_CACHE_DIR = os.path.join("assets", ".cache")  # Folder for generated cache files
+VIDEO_CACHE_MAGIC = b"SDVCACHE"  # Identifies a video cache file
+VIDEO_CACHE_VERSION = 1  # Bump when the file layout changes
+VIDEO_CACHE_HEADER = struct.Struct("<8sIIIIQQ")  # magic, version, width, height, frame count, source size, source mtime
+VIDEO_CACHE_DATA_OFFSET = 64  # Frame data starts after the (padded) header
+MAX_VIDEO_CACHE_BYTES = 2 * 1024 ** 3  # Give up caching videos that would need more disk than this
+
+
+def video_cache_path(source_path, size):
+    """Return the cache file path for a video at the given window size."""
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(VIDEO_CACHE_DIR, f"{name}.{size[0]}x{size[1]}.rgb")
+
+
+def read_video_cache_header(cache_path):
+    """Return the header fields of a cache file, or None if it is missing or not a cache file."""
+    try:
+        with open(cache_path, "rb") as cache_file:
+            data = cache_file.read(VIDEO_CACHE_HEADER.size)
+    except OSError:
+        return None
+    if len(data) < VIDEO_CACHE_HEADER.size:
+        return None
+    header = VIDEO_CACHE_HEADER.unpack(data)
+    if header[0] != VIDEO_CACHE_MAGIC or header[1] != VIDEO_CACHE_VERSION:
+        return None
+    return header
+
+
+def video_cache_is_fresh(source_path, cache_path, size):
+    """Check that the cache matches the current source file and window size."""
+    header = read_video_cache_header(cache_path)
+    if header is None:
+        return False
+    _, _, width, height, frame_count, source_size, source_mtime = header
+    source = os.stat(source_path)
+    return ((width, height) == tuple(size) and frame_count > 0
+            and source_size == source.st_size and source_mtime == source.st_mtime_ns)
+
+
+def build_video_cache(source_path, cache_path, size):
+    """Decode a video once and write it as raw window-sized RGB frames. Returns the frame count."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    source = os.stat(source_path)  # Remember which version of the source the cache was built from
+    frame_bytes = size[0] * size[1] * 3  # Bytes per RGB frame
+    temp_path = cache_path + ".tmp"  # Build into a temporary file so a half-written cache is never used
+    cap = cv2.VideoCapture(source_path)
+    frame_count = 0
+    try:
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(bytes(VIDEO_CACHE_DATA_OFFSET))  # Reserve space for the header
+            while True:
+                ret, frame = cap.read()  # Read the next frame from the video
+                if not ret:  # End of video
+                    break
+                if (frame_count + 1) * frame_bytes > MAX_VIDEO_CACHE_BYTES:  # Too long to cache
+                    frame_count = 0
+                    break
+                frame = cv2.resize(frame, size)  # Resize the video frame to window size
+                cache_file.write(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB).tobytes())  # Store the frame as RGB rows
+                frame_count += 1
+
+            cache_file.seek(0)  # Fill in the header now that the frame count is known
+            cache_file.write(VIDEO_CACHE_HEADER.pack(VIDEO_CACHE_MAGIC, VIDEO_CACHE_VERSION, size[0], size[1],
+                                                     frame_count, source.st_size, source.st_mtime_ns))
+    finally:
+        cap.release()
+
+    if frame_count == 0:  # Nothing usable was decoded
+        os.remove(temp_path)
+        return 0
+    os.replace(temp_path, cache_path)  # Publish the finished cache
+    return frame_count
+
+
+class VideoFrameCache:
+    """Memory-mapped raw frame cache shared by every player of the same video."""
+
+    def __init__(self, cache_path):
+        header = read_video_cache_header(cache_path)
+        _, _, self.width, self.height, self.frame_count, _, _ = header
+        self.frame_bytes = self.width * self.height * 3  # Bytes per RGB frame
+        with open(cache_path, "rb") as cache_file:
+            self.map = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)  # Map the whole file read-only
+        self.view = memoryview(self.map)  # Slicing a memoryview does not copy
+
+    def frame_surface(self, index):
+        """Return frame number index as a surface that points straight into the mapped file."""
+        start = VIDEO_CACHE_DATA_OFFSET + index * self.frame_bytes
+        return pygame.image.frombuffer(self.view[start:start + self.frame_bytes], (self.width, self.height), "RGB")
+
+
+class CachedVideo:
+    """Playback position in a VideoFrameCache; used in place of a cv2.VideoCapture."""
+
+    def __init__(self, cache):
+        self.cache = cache  # Shared frame cache
+        self.position = 0  # Index of the next frame to show
+
+    def next_surface(self, skip_frames=1):
+        """Advance by skip_frames and return the frame as a surface (loops at the end)."""
+        self.position = (self.position + skip_frames - 1) % self.cache.frame_count  # Skip frames to control playback speed
+        surface = self.cache.frame_surface(self.position)
+        self.position = (self.position + 1) % self.cache.frame_count
+        return surface
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:  # Seek, like cv2.VideoCapture.set
+            self.position = int(value) % self.cache.frame_count
+
+    def release(self):
+        pass  # The shared cache stays mapped for the other players
+
+
+video_caches = {}  # Open frame caches by source path
+
+
+def open_background_video(path):
+    """Return a player for a background video, building or refreshing its raw frame cache if needed.
+
+    Falls back to decoding with OpenCV when the video cannot be cached.
+    """
+    if path not in video_caches:
+        cache_path = video_cache_path(path, (WIDTH, HEIGHT))
+        try:
+            if not video_cache_is_fresh(path, cache_path, (WIDTH, HEIGHT)):
+                print(f"Building video cache for {path}...")
+                build_video_cache(path, cache_path, (WIDTH, HEIGHT))
+            video_caches[path] = VideoFrameCache(cache_path) if video_cache_is_fresh(path, cache_path, (WIDTH, HEIGHT)) else None
+        except (OSError, cv2.error) as error:
+            print(f"Could not cache {path}: {error}")
+            video_caches[path] = None
+
+    if video_caches[path] is None:
+        return cv2.VideoCapture(path)  # Decode the video every frame instead
+    return CachedVideo(video_caches[path])
+
+
+# Capture the videos for gameplay and menu background (both share one frame cache when they are the same file)
+if NO_VIDEO:
+    game_cap = menu_cap = None  # No background video in headless or no-video mode
+else:
+    game_cap = open_background_video(game_video_path)  # Load game video
+    menu_cap = open_background_video(menu_video_path)  # Load menu video
+
+
+# Background video decoder that prefetches frames on a worker thread
+class VideoDecoder:
+    """Decode a video on a worker thread into a bounded ring buffer of ready-to-blit surfaces."""
+
+    def __init__(self, cap, buffer_size=8):
+        self.cap = cap  # Video capture object to decode from
+        self.buffer_size = buffer_size  # Maximum number of frames decoded ahead
+        self.frames = deque()  # Decoded surfaces waiting to be shown
+        self.condition = threading.Condition()  # Guards the buffer and wakes the worker when space frees up
+        self.thread = None  # Worker thread (created by start)
+        self.running = False  # Whether the worker should keep decoding
+        self.last_frame = None  # Last frame handed to the render loop (reused on underrun)
+        self.blank_frame = None  # Black frame shown before the first frame is ready
+        self.error = None  # Exception that stopped the worker, if any
+        self.generation = 0  # Bumped by rewind() so frames decoded before it are thrown away
+        self.video_step = 1  # Video frames advanced per decoded frame (2 halves the video frame rate)
+        self.video_scale = 1  # Decode at 1/video_scale of the window size and scale up
+        self.pending_ticks = 0  # Ticks asked for that don't yet add up to a decoded frame
+        self.rewind_requested = False  # Whether the worker should seek back to the first frame
+
+        # Counters for reporting decoder health
+        self.decoded = 0  # Frames decoded by the worker
+        self.dropped = 0  # Decoded frames thrown away without being shown
+        self.underruns = 0  # Render requests that found the buffer empty
+
+    def start(self):
+        """Start the worker thread (does nothing if it is already running)."""
+        if self.thread is not None or isinstance(self.cap, CachedVideo):  # Cached frames need no worker
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._decode_loop, name="VideoDecoder", daemon=True)
+        self.thread.start()
+
+    def _decode_loop(self):
+        while True:
+            with self.condition:
+                while self.running and len(self.frames) >= self.buffer_size:  # Wait while the buffer is full
+                    self.condition.wait()
+                if not self.running:
+                    return
+                generation = self.generation
+                rewind, self.rewind_requested = self.rewind_requested, False
+
+            try:
+                if rewind:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Back to the first frame
+                frame = get_video_frame(self.cap, self.video_step, self.video_scale)  # Decode outside the lock so the render loop never waits on it
+            except cv2.error as error:  # Unreadable video: stop decoding and keep showing the last frame
+                self.error = error
+                return
+
+            with self.condition:
+                if generation == self.generation:  # Not decoded from before a rewind
+                    self.frames.append(frame)  # Hand the frame to the render loop
+                    self.decoded += 1
+
+    def next_frame(self, skip_frames=1):
+        """Return the next ready frame without blocking, skipping ahead by skip_frames (0 repeats the last one)."""
+        frames_due, self.pending_ticks = divmod(self.pending_ticks + skip_frames, self.video_step)  # Decoded frames to move on by
+        if frames_due <= 0 and self.last_frame is not None:  # No new frame due since the last one
+            return self.last_frame
+        skip_frames = max(frames_due, 1)
+
+        if isinstance(self.cap, CachedVideo):  # Memory-mapped frames are always ready
+            self.decoded += 1
+            self.last_frame = self.cap.next_surface(skip_frames * self.video_step)
+            return self.last_frame
+
+        with self.condition:
+            if self.frames:
+                for _ in range(min(skip_frames, len(self.frames)) - 1):  # Throw away frames we are skipping
+                    self.frames.popleft()
+                    self.dropped += 1
+                self.last_frame = self.frames.popleft()  # Take the next frame to show
+                self.condition.notify()  # Let the worker refill the buffer
+            else:
+                self.underruns += 1  # Nothing decoded yet: repeat the previous frame
+
+        if self.last_frame is None:  # No frame decoded yet: show a black screen
+            if self.blank_frame is None:
+                self.blank_frame = pygame.Surface((WIDTH, HEIGHT))
+            return self.blank_frame
+        return self.last_frame
+
+    def rewind(self):
+        """Play the video from the start again, throwing away frames decoded ahead."""
+        with self.condition:
+            if self.thread is None or not self.running:  # No worker using the capture: seek right away
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            else:
+                self.rewind_requested = True  # The worker seeks before its next frame
+                self.generation += 1
+            self.dropped += len(self.frames)
+            self.frames.clear()
+            self.condition.notify()
+
+    def stats(self):
+        """Return the decoder counters as a dictionary."""
+        with self.condition:
+            return {
+                "decoded": self.decoded,
+                "dropped": self.dropped,
+                "underruns": self.underruns,
+                "buffered": len(self.frames),
+            }
+
+    def stop(self):
+        """Stop the worker thread and release the capture."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()  # Wake the worker if it is waiting for space
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self.condition:
+            self.dropped += len(self.frames)  # Frames still buffered will never be shown
+            self.frames.clear()
+        self.cap.release()  # Release the video capture object
+        stats = self.stats()
+        print(f"Video decoder: {stats['decoded']} decoded, {stats['dropped']} dropped, {stats['underruns']} underruns")
+
+
+# Quality stages, from full quality to cheapest, each giving up a little more than the one before
+QualityStage = namedtuple("QualityStage", ["name", "video_step", "video_scale", "static_background", "hit_tint"])
+QUALITY_STAGES = (
+    QualityStage("full", 1, 1, False, True),
+    QualityStage("half-rate video", 2, 1, False, True),  # Convert every other video frame
+    QualityStage("low-res video", 2, 2, False, True),  # ...at half size, scaled up
+    QualityStage("static background", 1, 1, True, True),  # background-black.png instead of the video
+    QualityStage("no hit tint", 1, 1, True, False),  # Hit ships aren't tinted red
+)
+# Stages that only make the video cheaper to decode (they save nothing when frames come from a memory-mapped cache)
+VIDEO_DECODE_STAGES = tuple(index for index, stage in enumerate(QUALITY_STAGES)
+                            if not stage.static_background and (stage.video_step, stage.video_scale) != (1, 1))
+
+
+# Governor that lowers quality when frames take too long and raises it again when there is room
+class QualityGovernor:
+    def __init__(self, target_ms=1000 / 60, window=60, cooldown=120, slow=1.05, fast=0.6):
+        self.target_ms = target_ms  # Work time per frame the game should stay under
+        self.window = window  # Frames averaged before deciding
+        self.cooldown = cooldown  # Frames to wait after a change before another
+        self.slow = slow  # Step down when the average is above target * slow
+        self.fast = fast  # Step up when the average is below target * fast (with the cheaper stage's cost in mind)
+        self.auto = True  # False when a stage was chosen by hand
+        self.stage = 0  # Index into QUALITY_STAGES
+        self.samples = deque(maxlen=window)  # Recent frame work times in milliseconds
+        self.frames_since_change = 0
+        self.transitions = []  # (time, from stage, to stage, average ms) for every change
+        self.skipped = ()  # Stages the automatic steps pass over because they wouldn't help
+
+    @property
+    def settings(self):
+        return QUALITY_STAGES[self.stage]
+
+    def set_stage(self, stage, average_ms=None):
+        stage = max(0, min(stage, len(QUALITY_STAGES) - 1))
+        if stage == self.stage:
+            return False
+        self.transitions.append((time.time(), self.stage, stage, average_ms))
+        average = "" if average_ms is None else f" (frames took {average_ms:.1f} ms, target {self.target_ms:.1f} ms)"
+        print(f"Quality: {QUALITY_STAGES[self.stage].name} -> {QUALITY_STAGES[stage].name}{average}")
+        self.stage = stage
+        self.samples.clear()
+        self.frames_since_change = 0
+        return True
+
+    def update(self, work_ms):
+        """Add one frame's work time (excluding the frame-rate wait); return True if the stage changed."""
+        self.samples.append(work_ms)
+        self.frames_since_change += 1
+        if not self.auto or len(self.samples) < self.window or self.frames_since_change < self.cooldown:
+            return False
+        average = sum(self.samples) / len(self.samples)
+        if average > self.target_ms * self.slow:
+            return self.set_stage(self.step(1), average)
+        if average < self.target_ms * self.fast and self.stage > 0:
+            return self.set_stage(self.step(-1), average)
+        return False
+
+    def step(self, direction):
+        """Return the next stage up (direction -1) or down (direction 1), passing over the skipped ones."""
+        stage = self.stage + direction
+        while stage in self.skipped:
+            stage += direction
+        return stage
+
+    def apply(self, decoder):
+        """Set the video decoder up for the current stage."""
+        settings = self.settings
+        if decoder is not None:
+            self.skipped = VIDEO_DECODE_STAGES if isinstance(decoder.cap, CachedVideo) else ()  # Cached frames are blitted whole whatever the stage
+            decoder.video_step = settings.video_step
+            decoder.video_scale = settings.video_scale
+
+
+GOVERNOR = QualityGovernor()  # Quality of the game scene
+
+# Decoder for the game background video (started when the game begins)
+game_decoder = None if NO_VIDEO else VideoDecoder(game_cap)
+
 
 # Function to apply a color tint to an image
 def tint_image(image, tint_color):
@@ -58,134 +642,744 @@ def tint_image(image, tint_color):
     tinted_image.blit(tint_surface, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)  # Apply the tint to the image
     return tinted_image  # Return the tinted image
 
-# Function to display the main menu
+
+HIT_TINT = (255, 0, 0)  # Color used to tint a ship that was just hit
+
+
+# Cache of tinted sprites so a hit ship does not build a new surface every frame
+class TintCache:
+    """Bounded LRU cache of tinted sprite variants keyed by (source surface, tint color)."""
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size  # Maximum number of tinted variants kept
+        self.variants = OrderedDict()  # (surface, tint color) -> tinted surface, least recently used first
+        self.hits = 0  # Lookups served from the cache
+        self.misses = 0  # Lookups that had to build a tinted surface
+        self.evictions = 0  # Variants dropped to stay within max_size
+
+    def get(self, image, tint_color):
+        """Return the tinted variant of image, building it on first use."""
+        key = (image, tint_color)
+        tinted_image = self.variants.get(key)
+        if tinted_image is not None:
+            self.variants.move_to_end(key)  # Mark as recently used
+            self.hits += 1
+            return tinted_image
+
+        self.misses += 1
+        tinted_image = tint_image(image, tint_color)
+        self.variants[key] = tinted_image
+        if len(self.variants) > self.max_size:  # Evict the least recently used variant
+            self.variants.popitem(last=False)
+            self.evictions += 1
+        return tinted_image
+
+    def prewarm(self, images, tint_color=HIT_TINT):
+        """Build the tinted variants of images ahead of time."""
+        for image in images:
+            self.get(image, tint_color)
+
+    def stats(self):
+        """Return the cache counters as a dictionary."""
+        return {"size": len(self.variants), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+TINT_CACHE = TintCache()  # Tinted variants shared by every ship
+
+# Fonts used on the game screens, created on first use
+fonts = {}  # (name, size) -> pygame font
+
+def get_font(name, size):
+    """Return the system font name at size, creating it only once."""
+    key = (name, size)
+    if key not in fonts:
+        fonts[key] = pygame.font.SysFont(name, size)
+    return fonts[key]
+
+
+# Rendered text labels, re-rendered only when their text changes
+class TextCache:
+    def __init__(self):
+        self.labels = {}  # Slot name -> ((font name, size, text, color), rendered surface)
+        self.renders = 0  # Labels rendered
+        self.hits = 0  # Labels reused unchanged
+
+    def label(self, slot, font_name, size, text, color):
+        """Return the surface for text in slot, rendering it only if it changed since last time."""
+        key = (font_name, size, text, color)
+        entry = self.labels.get(slot)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+        surface = get_font(font_name, size).render(text, 1, color)
+        self.labels[slot] = (key, surface)  # One surface per slot, so changing scores don't pile up
+        self.renders += 1
+        return surface
+
+
+TEXT_CACHE = TextCache()  # Labels shared by every screen
+
+
+# Dirty rectangles: on a static background, only the regions drawn this frame or last frame go to the display
+class DirtyRects:
+    def __init__(self, background):
+        self.background = background.convert()  # What the screen shows where nothing is drawn (opaque, so erasing overwrites)
+        self.previous = []  # Regions drawn last frame (they must be erased and updated)
+        self.current = []  # Regions drawn this frame
+        self.full_update = True  # The first frame draws and updates the whole screen
+        self.screen = pygame.Rect(0, 0, WIDTH, HEIGHT)
+        self.updated_pixels = 0  # Pixels sent to the display so far
+
+    def erase_commands(self):
+        """Return the blits that draw the background over everything drawn last frame (or over the whole screen on the first frame)."""
+        if self.full_update:
+            return [(self.background, (0, 0))]
+        return [(self.background, rect, rect) for rect in self.previous]
+
+    def erase(self, window):
+        window.blits(self.erase_commands(), doreturn=0)
+
+    def add(self, rect):
+        if rect is not None:
+            rect = self.screen.clip(rect)  # Only the visible part matters
+            if rect.width and rect.height:
+                self.current.append(rect)
+
+    def update(self):
+        """Send the changed regions to the display."""
+        if self.full_update:
+            pygame.display.update()
+            self.updated_pixels += WIDTH * HEIGHT
+            self.full_update = False
+        else:
+            rects = self.previous + self.current
+            pygame.display.update(rects)
+            self.updated_pixels += sum(rect.width * rect.height for rect in rects)
+        self.previous, self.current = self.current, []
+
+
+opaque_background = None  # background-black.png without its alpha channel, made on first use
+
+# Function to get the static background as an opaque surface (it blits without alpha blending)
+def static_background():
+    global opaque_background
+    if opaque_background is None:
+        opaque_background = ASSETS.image("BACKGROUND").convert()
+    return opaque_background
+
+
+# Solid bar surfaces (health, fuel), blitted with an area as wide as the bar is full
+bar_surfaces = {}  # (color, width, height) -> surface
+
+def bar_surface(color, width, height=10):
+    key = (color, width, height)
+    if key not in bar_surfaces:
+        bar_surfaces[key] = pygame.Surface((width, height))
+        bar_surfaces[key].fill(color)
+    return bar_surfaces[key]
+
+
+# Layered renderer: draw commands are collected per layer, culled, and each layer is drawn with one Surface.blits call
+class LayerRenderer:
+    LAYERS = ("background", "projectiles", "ships", "pickups", "hud")  # Back to front
+
+    def __init__(self):
+        self.layers = {name: [] for name in self.LAYERS}  # Layer -> (image, position[, area]) commands this frame
+        self.layer_ms = dict.fromkeys(self.LAYERS, 0.0)  # Time each layer took to draw last frame
+        self.draw_calls = 0  # Blit calls made on the window last frame
+        self.sprites = 0  # Images drawn last frame
+        self.culled = 0  # Entities skipped last frame because they were off the screen
+        self.draw_ms = 0.0  # Time spent drawing the layers last frame
+        self.frames = 0  # Frames drawn so far
+        self.total_draw_calls = 0
+        self.total_sprites = 0
+        self.total_culled = 0
+        self.total_draw_ms = 0.0
+
+    def begin(self):
+        """Start collecting the commands of a new frame."""
+        for commands in self.layers.values():
+            commands.clear()
+        self.culled = 0
+
+    def add(self, layer, image, position, area=None):
+        self.layers[layer].append((image, position) if area is None else (image, position, area))
+
+    def add_sprite(self, layer, obj, image, alpha):
+        """Queue image at obj's interpolated position, unless it is entirely above or below the screen."""
+        x, y = interpolate(obj, alpha)
+        if y + image.get_height() <= 0 or y >= HEIGHT:
+            self.culled += 1
+            return None
+        self.layers[layer].append((image, (x, y)))
+        return x, y
+
+    def add_store(self, layer, store, alpha, image_of):
+        """Queue every live entity of an EntityStore that is on the screen, culling the rest in one NumPy operation."""
+        n = store.count
+        x = store.prev_x[:n] + (store.x[:n] - store.prev_x[:n]) * alpha  # Interpolated positions of the whole store
+        y = store.prev_y[:n] + (store.y[:n] - store.prev_y[:n]) * alpha
+        alive = store.alive[:n]
+        visible = alive & (y + store.height[:n] > 0) & (y < HEIGHT)
+        rows = np.flatnonzero(visible)
+        self.culled += int(np.count_nonzero(alive)) - len(rows)
+        objects = store.objects
+        self.layers[layer].extend((image_of(objects[row]), (sx, sy))
+                                  for row, sx, sy in zip(rows.tolist(), x[rows].tolist(), y[rows].tolist()))
+
+    def add_bar(self, layer, x, y, width, ratio, fill_color, empty_color=(255, 0, 0)):
+        """Queue a 10 pixel high bar: the empty color under the filled part."""
+        self.layers[layer].append((bar_surface(empty_color, width), (x, y)))
+        self.layers[layer].append((bar_surface(fill_color, width), (x, y), pygame.Rect(0, 0, width * max(ratio, 0), 10)))
+
+    def submit(self, window, dirty=None):
+        """Draw every layer, back to front, and add the drawn areas to dirty (background erasing excluded)."""
+        draw_calls = sprites = 0
+        draw_start = time.perf_counter()
+        for name in self.LAYERS:
+            commands = self.layers[name]
+            if not commands:
+                self.layer_ms[name] = 0.0
+                continue
+            start = time.perf_counter()
+            rects = window.blits(commands, doreturn=dirty is not None and name != "background")
+            self.layer_ms[name] = (time.perf_counter() - start) * 1000
+            if rects:
+                for rect in rects:
+                    dirty.add(rect)
+            draw_calls += 1
+            sprites += len(commands)
+        self.draw_calls, self.sprites = draw_calls, sprites
+        self.draw_ms = (time.perf_counter() - draw_start) * 1000
+        self.frames += 1
+        self.total_draw_calls += draw_calls
+        self.total_sprites += sprites
+        self.total_culled += self.culled
+        self.total_draw_ms += self.draw_ms
+
+    def counts(self):
+        """Return last frame's counters, for the profiler."""
+        return {"draw_calls": self.draw_calls, "sprites_drawn": self.sprites, "culled": self.culled}
+
+    def report(self):
+        if not self.frames:
+            return "Renderer: no frames drawn"
+        return (f"Renderer: {self.total_draw_calls / self.frames:.1f} draw calls, {self.total_sprites / self.frames:.1f} sprites, "
+                f"{self.total_culled / self.frames:.1f} culled and {self.total_draw_ms / self.frames:.3f} ms per frame")
+
+
+RENDERER = LayerRenderer()  # Draws the game screen
+
+
+# Function to draw one frame of the main menu
+def draw_menu(window, video_frame):
+    if video_frame is None:  # No video: draw on the static background
+        video_frame = static_background()
+    window.blit(video_frame, (0, 0))  # Draw the video frame on the window
+
+    # Draw the centered image
+    center_image = ASSETS.image("MENU_TITLE")  # Title image, already scaled to 1000x500
+    center_x = (WIDTH - center_image.get_width()) // 2
+    center_y = (HEIGHT - center_image.get_height()) // 8
+    window.blit(center_image, (center_x, center_y))
+
+    # Render the title and control text
+    enter_text = TEXT_CACHE.label("menu_title", "comicsans", 70, "", (255, 255, 255))  # Title text
+    controls_text = TEXT_CACHE.label("menu_controls", "comicsans", 40, "Enter to start", (255, 255, 255))  # Control instructions text
+
+    # Display the title and controls on the screen
+    window.blit(enter_text, (WIDTH // 2 - enter_text.get_width() // 2, HEIGHT // 3))  # Center the title on the screen
+    window.blit(controls_text, (WIDTH // 2 - controls_text.get_width() // 2, HEIGHT // 2 + 100))  # Center the controls text
+
+# Scene: the main menu. Returns the next scene ("playing" or "quit").
 def main_menu():
-    menu_font = pygame.font.SysFont("comicsans", 70)  # Font for the main title
-    controls_font = pygame.font.SysFont("comicsans", 40)  # Font for the controls text
     clock = pygame.time.Clock()  # Create a clock to control frame rate
-    FPS = 60  # Set the frame rate to 60 FPS
+    timestep = FixedTimestep(60)  # The menu video plays at 60 frames per second whatever the draw rate
+
+    ASSETS.prefetch()  # Load the game sprites in the background while the menu plays
 
     # Play the menu music in loop
     pygame.mixer.music.load(MENU_MUSIC)  # Load the menu music file
     pygame.mixer.music.play(-1)  # Play the music indefinitely
 
-    # Load and prepare the centered image
-    center_image = pygame.image.load(os.path.join("assets", "spacediddler.png"))
-    center_image = pygame.transform.scale(center_image, (1000, 500))  # Resize if needed
-    center_x = (WIDTH - center_image.get_width()) // 2
-    center_y = (HEIGHT - center_image.get_height()) // 8
+    menu_decoder = None if NO_VIDEO else VideoDecoder(menu_cap)  # Decode the menu video in the background
+    dirty = None  # Dirty-rect tracking, when the menu is static
+    if menu_decoder is None:  # No video: the menu never changes, so draw it once
+        static_menu = pygame.Surface((WIDTH, HEIGHT)).convert()
+        draw_menu(static_menu, None)
+        dirty = DirtyRects(static_menu)
+    else:
+        menu_decoder.start()
+
+    INPUT.clear()
+    frame_rate = SCHEDULER.frame_rate("menu")
+    next_scene = None  # Set when the menu is left
+    while next_scene is None:  # Main loop for the menu
+        with PROFILER.phase("tick"):
+            steps = timestep.advance(clock.tick(frame_rate) / 1000)  # Video frames owed for the time since the last frame
+
+        # Event handling loop (before drawing, so a key press shows up in this frame)
+        with PROFILER.phase("events"):
+            animating = dirty is None or PROFILER.overlay_visible  # The static menu only changes with the overlay
+            for event in INPUT.pump(SCHEDULER.idle_timeout(animating)):
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:  # F3 shows or hides the profiler overlay
+                    PROFILER.toggle_overlay()
+                if event.type == pygame.QUIT:  # If the user closes the window
+                    next_scene = "quit"  # Exit the program
+            if INPUT.take("start") and next_scene is None:  # If the Enter key is pressed
+                next_scene = "playing"  # Exit the menu loop and start the game
+
+        if not SCHEDULER.active():  # In the background: stop taking video frames (the decoder stops once its buffer is full)
+            continue
+        if dirty is None:
+            with PROFILER.phase("video"):
+                video_frame = menu_decoder.next_frame(steps)  # Next frame of the menu video
+            with PROFILER.phase("draw"):
+                draw_menu(WIN, video_frame)  # Draw the video frame with the title on top
+            PROFILER.draw_overlay(WIN)
+            with PROFILER.phase("display"):
+                pygame.display.update()  # Update the display with the new frame
+        else:
+            with PROFILER.phase("draw"):
+                dirty.erase(WIN)  # Only the profiler overlay ever changes
+            dirty.add(PROFILER.draw_overlay(WIN))
+            with PROFILER.phase("display"):
+                dirty.update()
+        PROFILER.end_frame("menu")
+
+    if menu_decoder is not None:
+        menu_decoder.stop()  # Stop decoding and release the video capture object for the menu
+    pygame.mixer.music.stop()  # Stop the menu music when the game starts
+    return next_scene
 
-    run = True  # Boolean to control the main menu loop
-    while run:  # Main loop for the menu
-        clock.tick(FPS)  # Ensure the game runs at the specified FPS
-        video_frame = get_video_frame(menu_cap)  # Get the current frame from the menu video
-        WIN.blit(video_frame, (0, 0))  # Draw the video frame on the window
+# Scene: the game over screen. Returns the next scene ("playing" or "quit").
+def game_over_screen():
+    clock = pygame.time.Clock()  # Nothing moves here, so a low frame rate is plenty
+    over_label = TEXT_CACHE.label("game_over", "system", 150, "Game Over", (255, 0, 0))  # Render "Game Over" text
+    restart_label = TEXT_CACHE.label("game_over_restart", "system", 80, "Press R to Restart", (255, 255, 255))  # Render restart instructions
+    quit_label = TEXT_CACHE.label("game_over_quit", "system", 80, "Press Q to Quit", (255, 255, 255))  # Render quit instructions
+    SCORES.flush()  # Between scenes: make sure the game just played is on the leaderboard
+    high_score_label = TEXT_CACHE.label("high_score", "system", 60, f"High Score: {SCORES.high_score()}", (255, 255, 0))
+
+    # Draw the game over text and instructions once, on a black background
+    screen = pygame.Surface((WIDTH, HEIGHT)).convert()  # Fill the screen with black background
+    screen.blit(over_label, (WIDTH // 2 - over_label.get_width() // 2, HEIGHT // 2 - 100))  # Center "Game Over" text
+    screen.blit(restart_label, (WIDTH // 2 - restart_label.get_width() // 2, HEIGHT // 2))  # Center restart instructions
+    screen.blit(quit_label, (WIDTH // 2 - quit_label.get_width() // 2, HEIGHT // 2 + 100))  # Center quit instructions
+    screen.blit(high_score_label, (WIDTH // 2 - high_score_label.get_width() // 2, HEIGHT // 2 - 180))  # Above "Game Over"
+    dirty = DirtyRects(screen)
+
+    INPUT.clear()  # Only presses made on this screen count
+    frame_rate = SCHEDULER.frame_rate("game_over")
+    while True:  # Main loop for game over screen
+        clock.tick(frame_rate)
+
+        # Event handling loop (the screen is still, so this sleeps until a key is pressed or the overlay needs redrawing)
+        for event in INPUT.pump(SCHEDULER.idle_timeout(PROFILER.overlay_visible)):
+            if event.type == pygame.QUIT:  # If the user closes the window
+                return "quit"  # Exit the program
+
+        # Check if player wants to restart or quit (once per key press, not while a key is held)
+        if INPUT.take("restart"):  # If "R" is pressed, restart the game
+            return "playing"  # Start a new game
+        if INPUT.take("quit"):  # If "Q" is pressed, quit the game
+            return "quit"  # Exit the program
+
+        dirty.erase(WIN)  # Only the profiler overlay changes after the first frame
+        dirty.add(PROFILER.draw_overlay(WIN))
+        dirty.update()  # Update the display with the new screen
+
+ATLAS_MANIFEST = "atlas.json"  # Sprite atlas written by build_atlas.py, in the assets folder
+ATLAS_VERSION = 2  # Bump when the atlas layout changes
+
+# Function to fingerprint a sprite's source file for the atlas manifest
+def atlas_source_stamp(path):
+    """Return the size, modification time and SHA-1 of a source file, as build_atlas.py records them."""
+    stat = os.stat(path)
+    with open(path, "rb") as source_file:
+        digest = hashlib.sha1(source_file.read()).hexdigest()
+    return {"source_bytes": stat.st_size, "source_mtime": stat.st_mtime_ns, "source_sha1": digest}
+
+# Function to check that the atlas was built from the current version of a source file
+def atlas_source_is_fresh(path, entry):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return True  # The atlas is all there is of a missing source
+    if stat.st_size != entry["source_bytes"]:
+        return False
+    if stat.st_mtime_ns == entry["source_mtime"]:  # Same size and time: unchanged, like the video cache
+        return True
+    return atlas_source_stamp(path)["source_sha1"] == entry["source_sha1"]  # Touched (a fresh checkout, say): compare contents
+
+# Function to rebuild a collision mask from build_atlas.py's rows of bits (first pixel in the lowest bit)
+def mask_from_bits(data, offset, size):
+    width, height = size
+    row_bytes = (width + 7) // 8
+    mask = pygame.mask.Mask(size)
+    words = np.asarray(mask)  # The mask's own memory: one column of words per group of word-size pixels
+    word_bytes = words.itemsize
+    rows = np.zeros((height, words.shape[0] * word_bytes), np.uint8)
+    rows[:, :row_bytes] = np.frombuffer(data, np.uint8, row_bytes * height, offset).reshape(height, row_bytes)
+    words[:] = rows.view(f"<u{word_bytes}").T  # Pixel x is bit x % bits of word x // bits, like the packed rows
+    return mask
+
+
+# Registry that loads every sprite once, the first time it is needed
+class AssetRegistry:
+    """Lazily loaded, shared sprites: each image is loaded, scaled and converted once, with its mask."""
+
+    def __init__(self, folder="assets", atlas=ATLAS_MANIFEST):
+        self.folder = folder  # Folder holding the image files
+        self.atlas = atlas  # Atlas manifest in folder (None loads every sprite from its own file)
+        self.specs = {}  # Asset name -> (file name, size to scale to or None)
+        self.images = {}  # Asset name -> converted surface
+        self.masks = {}  # Asset name -> collision mask
+        self.load_times = {}  # Asset name -> seconds spent loading it
+        self.lock = threading.Lock()  # Guards the dictionaries (the prefetch thread loads too)
+        self.atlas_lock = threading.Lock()  # Makes sure the atlas is loaded once
+        self.atlas_entries = None  # Up-to-date atlas sprites by name, read from the manifest on first use
+        self.prefetch_thread = None  # Background loader started by prefetch()
+
+    def register(self, name, filename, size=None):
+        """Declare an asset without loading it."""
+        self.specs[name] = (filename, size)
+
+    def atlas_sprites(self):
+        """Return the manifest entries of the sprites the atlas has up to date (none if there is no atlas)."""
+        if self.atlas_entries is None:
+            self.atlas_entries = {}
+            path = os.path.join(self.folder, self.atlas) if self.atlas else None
+            if path and os.path.exists(path):
+                with open(path) as manifest_file:
+                    manifest = json.load(manifest_file)
+                if manifest.get("version") == ATLAS_VERSION:
+                    for name, entry in manifest["sprites"].items():
+                        size = tuple(entry["size"]) if entry["size"] is not None else None
+                        source = os.path.join(self.folder, entry["file"])
+                        if self.specs.get(name) == (entry["file"], size) and atlas_source_is_fresh(source, entry):
+                            self.atlas_entries[name] = dict(entry, image=manifest["image"], masks=manifest["masks"])
+        return self.atlas_entries
+
+    def _load_atlas(self):
+        """Load the atlas image once and share its sprites as subsurfaces, with their prebuilt masks."""
+        with self.atlas_lock:
+            entries = self.atlas_sprites()
+            if not entries or all(name in self.images for name in entries):
+                return
+            start = time.perf_counter()
+            first = next(iter(entries.values()))
+            atlas = pygame.image.load(os.path.join(self.folder, first["image"])).convert_alpha()
+            with open(os.path.join(self.folder, first["masks"]), "rb") as masks_file:
+                mask_data = masks_file.read()
+            images, masks = {}, {}
+            for name, entry in entries.items():
+                x, y, width, height = entry["rect"]
+                images[name] = atlas.subsurface((x, y, width, height))  # Shares the atlas pixels
+                masks[name] = mask_from_bits(mask_data, entry["mask_offset"], (width, height))
+            elapsed = time.perf_counter() - start
+
+            with self.lock:
+                for name in entries:
+                    if name not in self.images:
+                        self.images[name] = images[name]
+                        self.masks[name] = masks[name]
+                self.load_times["atlas"] = elapsed
+
+    def _load(self, name):
+        if name in self.atlas_sprites():
+            self._load_atlas()
+            if name in self.images:
+                return
+        start = time.perf_counter()
+        filename, size = self.specs[name]
+        image = pygame.image.load(os.path.join(self.folder, filename))  # Load the image from disk
+        if size is not None:
+            image = pygame.transform.scale(image, size)  # Scale it to its in-game size
+        image = image.convert_alpha()  # Match the display format so blits take the fast path
+        mask = pygame.mask.from_surface(image)  # Mask for pixel-perfect collision detection
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            if name not in self.images:  # Keep the first copy if the prefetch thread got there too
+                self.images[name] = image
+                self.masks[name] = mask
+                self.load_times[name] = elapsed
+
+    def image(self, name):
+        """Return the sprite called name, loading it on first use."""
+        image = self.images.get(name)
+        if image is None:
+            self._load(name)
+            image = self.images[name]
+        return image
+
+    def mask(self, name):
+        """Return the collision mask of the sprite called name."""
+        if name not in self.masks:
+            self._load(name)
+        return self.masks[name]
+
+    def prefetch(self, names=None):
+        """Load assets on a background thread (all registered assets by default)."""
+        if self.prefetch_thread is not None:
+            return
+        names = list(self.specs) if names is None else list(names)
+
+        def load_missing():
+            for name in names:
+                if name not in self.images:
+                    self._load(name)
+
+        self.prefetch_thread = threading.Thread(target=load_missing, name="AssetPrefetch", daemon=True)
+        self.prefetch_thread.start()
+
+    def report(self):
+        """Return the load time in milliseconds of every asset loaded so far."""
+        with self.lock:
+            return {name: seconds * 1000 for name, seconds in self.load_times.items()}
+
+
+ASSETS = AssetRegistry()  # Sprites shared by the whole game
+
+# Spaceship images and their in-game sizes
+ASSETS.register("BLACK_SPACE_SHIP", "MINI_ENEMY.png", (70, 70))  # Black ship image
+ASSETS.register("RED_SPACE_SHIP", "ship2.png", (70, 70))  # Red ship image
+ASSETS.register("GREEN_SPACE_SHIP", "ship5.png", (70, 70))  # Green ship image
+ASSETS.register("BLUE_SPACE_SHIP", "blueship1.png", (70, 70))  # Blue ship image
+ASSETS.register("MY_SHIP", "ship1.png", (70, 70))  # Player ship image
+ASSETS.register("BOSS_SHIP", "BOSS_DIDDY.png", (150, 150))  # Boss ship image
+
+# Laser images
+ASSETS.register("BLACK_LASER", "ENEMY_LASER_BLAST.png", (30, 30))  # Black ship laser image
+ASSETS.register("DIDDY_LASER", "diddyoil.png", (120, 120))  # Diddy laser image
+ASSETS.register("RED_LASER", "red.png", (30, 30))  # Red laser image
+ASSETS.register("GREEN_LASER", "green.png", (30, 30))  # Green laser image
+ASSETS.register("BLUE_LASER", "blue.png", (30, 30))  # Blue laser image
+ASSETS.register("YELLOW_LASER", "yellow.png", (30, 30))  # Yellow laser image
+ASSETS.register("SUPER_LASER", "myLaser.png", (100, 100))  # Super laser image
+
+# Power-up, menu and background images
+ASSETS.register("BACKGROUND", "background-black.png", (WIDTH, HEIGHT))  # Static background when video is off
+ASSETS.register("HEALTH_ORB", "healthOrb.png.png", (50, 50))  # Health power-up image
+ASSETS.register("FUEL_ORB", "bluorb.png", (50, 50))  # Fuel (and shield) power-up image
+ASSETS.register("MENU_TITLE", "spacediddler.png", (1000, 500))  # Title image in the main menu
+
+# Precomputed projectile sprites: the rotated surface, its mask and its bounding rect for each (image, angle)
+ProjectileTemplate = namedtuple("ProjectileTemplate", ["img", "mask", "rect"])
+projectile_templates = {}  # (image, angle) -> ProjectileTemplate shared by every laser using it
+
+def projectile_template(img, angle=0):
+    """Return the shared template for img rotated by angle degrees, building it on first use."""
+    key = (img, angle)
+    template = projectile_templates.get(key)
+    if template is None:
+        rotated = img if angle == 0 else pygame.transform.rotate(img, angle)  # Rotate once, not per shot
+        mask = pygame.mask.from_surface(rotated)  # Mask for pixel-perfect collision detection
+        bounds = mask.get_bounding_rects()  # Opaque regions of the sprite
+        rect = bounds[0].unionall(bounds[1:]) if bounds else rotated.get_rect()  # Tight box around them
+        template = projectile_templates[key] = ProjectileTemplate(rotated, mask, rect)
+    return template
+
+# Struct-of-arrays storage so the whole world can be moved and culled in a few NumPy operations
+class EntityStore:
+    """Contiguous position, velocity, owner, height and alive arrays, one row per entity."""
+
+    COLUMNS = ("x", "y", "prev_x", "prev_y", "vel", "owner", "height", "alive")  # Per-entity arrays
+
+    def __init__(self, capacity=256):
+        self.pool = None  # ObjectPool that takes back the objects of dropped rows
+        self.count = 0  # Rows in use (alive or waiting for compaction)
+        self.x = np.zeros(capacity)  # X-coordinates
+        self.y = np.zeros(capacity)  # Y-coordinates
+        self.prev_x = np.zeros(capacity)  # X-coordinates at the start of the tick (for render interpolation)
+        self.prev_y = np.zeros(capacity)  # Y-coordinates at the start of the tick
+        self.vel = np.zeros(capacity)  # Vertical velocity in pixels per tick
+        self.owner = np.zeros(capacity, dtype=np.int8)  # Who the entity belongs to (OWNER_* constants)
+        self.height = np.zeros(capacity)  # Sprite height, for off-screen checks
+        self.alive = np.zeros(capacity, dtype=bool)  # False once the entity has been removed
+        self.objects = [None] * capacity  # Python object for each row
+
+    def add(self, obj, x, y, vel=0, owner=0, height=0):
+        """Give obj a row in the store and return its slot."""
+        if self.count == len(self.x):  # Full: double the capacity
+            for column in self.COLUMNS:
+                array = getattr(self, column)
+                setattr(self, column, np.concatenate([array, np.zeros_like(array)]))
+            self.objects.extend([None] * self.count)
+        slot = self.count
+        self.x[slot], self.y[slot], self.vel[slot] = x, y, vel
+        self.prev_x[slot], self.prev_y[slot] = x, y
+        self.owner[slot], self.height[slot], self.alive[slot] = owner, height, True
+        self.objects[slot] = obj
+        obj.store, obj.slot = self, slot
+        self.count += 1
+        return slot
+
+    def save_positions(self):
+        """Remember every position as the previous one, for render interpolation."""
+        self.prev_x[:self.count] = self.x[:self.count]
+        self.prev_y[:self.count] = self.y[:self.count]
+
+    def move(self):
+        """Move every entity by its velocity in one operation."""
+        self.y[:self.count] += self.vel[:self.count]
+
+    def kill_off_screen(self, height):
+        """Mark entities outside 0..height as dead (projectile culling)."""
+        y = self.y[:self.count]
+        self.alive[:self.count] &= (y >= 0) & (y <= height)
+
+    def below(self, height):
+        """Return the live entities whose bottom edge is past height."""
+        n = self.count
+        rows = np.flatnonzero(self.alive[:n] & (self.y[:n] + self.height[:n] > height))
+        return [self.objects[row] for row in rows]
+
+    def roll(self, rng, chance):
+        """Return the live entities that win a 1-in-chance roll this tick."""
+        n = self.count
+        rows = np.flatnonzero(self.alive[:n] & (rng.integers(0, chance, size=n) == 1))
+        return [self.objects[row] for row in rows]
+
+    def compact(self):
+        """Drop dead rows, moving the live ones to the front (done once per tick)."""
+        n = self.count
+        keep = np.flatnonzero(self.alive[:n])
+        if len(keep) == n:
+            return
+        if self.pool is not None:  # Nothing refers to dead entities after this point, so they can be reused
+            for row in np.flatnonzero(~self.alive[:n]):
+                self.pool.release(self.objects[row])
+        for column in self.COLUMNS:
+            array = getattr(self, column)
+            array[:len(keep)] = array[keep]
+        survivors = [self.objects[row] for row in keep]
+        for slot, obj in enumerate(survivors):
+            obj.slot = slot
+        self.objects[:n] = survivors + [None] * (n - len(keep))
+        self.alive[len(keep):n] = False
+        self.count = len(keep)
+
+    def clear(self):
+        """Remove every entity."""
+        if self.pool is not None:
+            for obj in self.objects[:self.count]:
+                self.pool.release(obj)
+        self.alive[:self.count] = False
+        self.objects[:self.count] = [None] * self.count
+        self.count = 0
+
+
+# Function to build an attribute that lives in the entity's row of its store
+def stored(column):
+    def get(self):
+        return getattr(self.store, column)[self.slot]
+
+    def set(self, value):
+        getattr(self.store, column)[self.slot] = value
+
+    return property(get, set)
+
+
+# Free list of reusable objects, so spawning doesn't allocate (and the garbage collector has less to do)
+class ObjectPool:
+    def __init__(self, cls, size):
+        self.cls = cls  # Class of the pooled objects (reinitialized with __init__ on acquire)
+        self.size = size  # Objects preallocated
+        self.free = [cls.__new__(cls) for _ in range(size)]  # Objects ready to hand out
+        self.in_use = 0  # Objects handed out and not yet released
+        self.peak = 0  # Most objects in use at once
+        self.acquired = 0  # Objects handed out so far
+        self.misses = 0  # Objects that had to be allocated because the free list was empty
+
+    def acquire(self, *args, **kwargs):
+        """Return a free object initialized with the given arguments."""
+        if self.free:
+            obj = self.free.pop()
+        else:
+            obj = self.cls.__new__(self.cls)
+            self.misses += 1
+        obj.__init__(*args, **kwargs)
+        self.acquired += 1
+        self.in_use += 1
+        if self.in_use > self.peak:
+            self.peak = self.in_use
+        return obj
 
-        # Draw the centered image
-        WIN.blit(center_image, (center_x, center_y))
+    def release(self, obj):
+        """Take back an object nothing refers to any more."""
+        self.in_use -= 1
+        self.free.append(obj)
 
-        # Render the title and control text
-        enter_text = menu_font.render("", 1, (255, 255, 255))  # Title text
-        controls_text = controls_font.render("Enter to start", 1, (255, 255, 255))  # Control instructions text
+    def stats(self):
+        return {"size": self.size, "in_use": self.in_use, "peak": self.peak, "acquired": self.acquired, "misses": self.misses}
 
-        # Display the title and controls on the screen
-        WIN.blit(enter_text, (WIDTH // 2 - enter_text.get_width() // 2, HEIGHT // 3))  # Center the title on the screen
-        WIN.blit(controls_text, (WIDTH // 2 - controls_text.get_width() // 2, HEIGHT // 2 + 100))  # Center the controls text
 
-        pygame.display.update()  # Update the display with the new frame
+# Who a laser belongs to
+OWNER_PLAYER, OWNER_ENEMY, OWNER_BOSS = 0, 1, 2
 
-        # Event handling loop
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:  # If the user closes the window
-                run = False  # Exit the menu loop
-                pygame.quit()  # Quit pygame
-                menu_cap.release()  # Release the video capture object
-                quit()  # Exit the program
 
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:  # If the Enter key is pressed
-                run = False  # Exit the menu loop and start the game
+# The array-backed world: every projectile and every enemy
+class EntityWorld:
+    def __init__(self):
+        self.projectiles = EntityStore()  # Every laser in flight
+        self.enemies = EntityStore()  # Every enemy ship
+        self.power_ups = []  # Every power-up (few enough to keep in a plain list)
+        self.rng = np.random.default_rng()  # Random numbers for the vectorized fire rolls
 
-    menu_cap.release()  # Release the video capture object for the menu
-    pygame.mixer.music.stop()  # Stop the menu music when the game starts
+    def move(self, height):
+        """Move all projectiles and enemies and cull the projectiles that left the screen."""
+        self.projectiles.move()
+        self.enemies.move()
+        self.projectiles.kill_off_screen(height)
 
-# Function to display the game over screen
-def game_over_screen():
-    over_font = pygame.font.SysFont("system", 150)  # Font for "Game Over" text
-    restart_font = pygame.font.SysFont("system", 80)  # Font for restart instructions
-    quit_font = pygame.font.SysFont("system", 80)  # Font for quit instructions
-
-    run = True  # Boolean to control the game over loop
-    while run:  # Main loop for game over screen
-        WIN.fill((0, 0, 0))  # Fill the screen with black background
-        over_label = over_font.render("Game Over", 1, (255, 0, 0))  # Render "Game Over" text
-        restart_label = restart_font.render("Press R to Restart", 1, (255, 255, 255))  # Render restart instructions
-        quit_label = quit_font.render("Press Q to Quit", 1, (255, 255, 255))  # Render quit instructions
-
-        # Display the game over text and instructions
-        WIN.blit(over_label, (WIDTH // 2 - over_label.get_width() // 2, HEIGHT // 2 - 100))  # Center "Game Over" text
-        WIN.blit(restart_label, (WIDTH // 2 - restart_label.get_width() // 2, HEIGHT // 2))  # Center restart instructions
-        WIN.blit(quit_label, (WIDTH // 2 - quit_label.get_width() // 2, HEIGHT // 2 + 100))  # Center quit instructions
-
-        pygame.display.update()  # Update the display with the new screen
-
-        # Event handling loop
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:  # If the user closes the window
-                pygame.quit()  # Quit pygame
-                quit()  # Exit the program
-
-        # Check if player wants to restart or quit
-        keys = pygame.key.get_pressed()  # Get the pressed keys
-        if keys[pygame.K_r]:  # If "R" is pressed, restart the game
-            main()  # Call the main game function
-        if keys[pygame.K_q]:  # If "Q" is pressed, quit the game
-            pygame.quit()  # Quit pygame
-            quit()  # Exit the program
-
-# Load spaceship images and transform them to appropriate sizes
-BLACK_SPACE_SHIP = pygame.image.load(os.path.join("assets", "MINI_ENEMY.png"))  # Red ship image
-BLACK_SPACE_SHIP = pygame.transform.scale(BLACK_SPACE_SHIP, (70, 70))  # Scale the red ship
-RED_SPACE_SHIP = pygame.image.load(os.path.join("assets", "ship2.png"))  # Red ship image
-RED_SPACE_SHIP = pygame.transform.scale(RED_SPACE_SHIP, (70, 70))  # Scale the red ship
-GREEN_SPACE_SHIP = pygame.image.load(os.path.join("assets", "ship5.png"))  # Green ship image
-GREEN_SPACE_SHIP = pygame.transform.scale(GREEN_SPACE_SHIP, (70, 70))  # Scale the green ship
-BLUE_SPACE_SHIP = pygame.image.load(os.path.join("assets", "blueship1.png"))  # Blue ship image
-BLUE_SPACE_SHIP = pygame.transform.scale(BLUE_SPACE_SHIP, (70, 70))  # Scale the blue ship
-MY_SHIP = pygame.image.load(os.path.join("assets", "ship1.png"))  # Player ship image
-MY_SHIP = pygame.transform.scale(MY_SHIP, (70, 70))  # Scale the player ship
-
-# Load laser images
-BLACK_LASER = pygame.image.load(os.path.join("assets", "ENEMY_LASER_BLAST.png"))  # Yellow laser image
-BLACK_LASER = pygame.transform.scale(BLACK_LASER, (30, 30))  # Scale yellow laser
-DIDDY_LASER = pygame.image.load(os.path.join("assets", "diddyoil.png"))  # Diddy laser image
-DIDDY_LASER = pygame.transform.scale(DIDDY_LASER, (120, 120))  # Scale Diddy laser
-RED_LASER = pygame.image.load(os.path.join("assets", "red.png"))  # Red laser image
-RED_LASER = pygame.transform.scale(RED_LASER, (30, 30))  # Scale the red laser
-GREEN_LASER = pygame.image.load(os.path.join("assets", "green.png"))  # Green laser image
-GREEN_LASER = pygame.transform.scale(GREEN_LASER, (30, 30))  # Scale the green laser
-BLUE_LASER = pygame.image.load(os.path.join("assets", "blue.png"))  # Blue laser image
-BLUE_LASER = pygame.transform.scale(BLUE_LASER, (30, 30))  # Scale the blue laser
-YELLOW_LASER = pygame.image.load(os.path.join("assets", "yellow.png"))  # Yellow laser image
-YELLOW_LASER = pygame.transform.scale(YELLOW_LASER, (30, 30))  # Scale yellow laser
-SUPER_LASER = pygame.image.load(os.path.join("assets", "myLaser.png"))  # Super laser image
-SUPER_LASER = pygame.transform.scale(SUPER_LASER, (100, 100))  # Scale super laser
+    def compact(self):
+        """Drop everything removed this tick."""
+        self.projectiles.compact()
+        self.enemies.compact()
 
-# Laser class for handling laser behavior
-class Laser:
-    def __init__(self, x, y, img):
-        self.x = x  # X-coordinate of laser
-        self.y = y  # Y-coordinate of laser
-        self.img = img  # Laser image
-        self.mask = pygame.mask.from_surface(self.img)  # Create a mask for pixel-perfect collision detection
+    def save_positions(self):
+        self.projectiles.save_positions()
+        self.enemies.save_positions()
 
-    def draw(self, window):
-        window.blit(self.img, (self.x, self.y))  # Draw the laser on the window
+    def clear(self):
+        self.projectiles.clear()
+        self.enemies.clear()
+        for power_up in self.power_ups:
+            POWER_UP_POOL.release(power_up)
+        self.power_ups.clear()
+
+
+world = EntityWorld()  # Entities of the running game
+
+
+LASER_VEL = 5  # Laser movement speed
+
+
+# Function to find where to draw an object between two simulation ticks
+def interpolate(obj, alpha):
+    """Return obj's position alpha of the way from the previous tick to the current one."""
+    return obj.prev_x + (obj.x - obj.prev_x) * alpha, obj.prev_y + (obj.y - obj.prev_y) * alpha
 
-    def move(self, vel):
-        self.y += vel  # Move the laser by its velocity along the y-axis
 
-    def off_screen(self, height):
-        return not(self.y <= height and self.y >= 0)  # Check if the laser is off the screen
+# Laser class for handling laser behavior
+class Laser:
+    __slots__ = ("img", "mask", "rect", "store", "slot")  # Lasers are pooled and numerous: no per-instance dict
+
+    x = stored("x")  # X-coordinate of laser
+    y = stored("y")  # Y-coordinate of laser
+    prev_x = stored("prev_x")  # Position at the start of the tick
+    prev_y = stored("prev_y")
+    vel = stored("vel")  # Speed along the y-axis
+    alive = stored("alive")  # False once the laser hit something or left the screen
+
+    def __init__(self, x, y, img, angle=0, vel=0, owner=OWNER_ENEMY):
+        template = projectile_template(img, angle)  # Shared sprite and mask for this image and angle
+        self.img = template.img  # Laser image
+        self.mask = template.mask  # Mask for pixel-perfect collision detection
+        self.rect = template.rect  # Bounding box of the opaque pixels, relative to (x, y)
+        world.projectiles.add(self, x, y, vel, owner, self.img.get_height())  # Position and velocity live in the world arrays
 
     def collision(self, obj):
         return collide(self, obj)  # Check if the laser collides with another object
@@ -194,10 +1388,15 @@ class Laser:
 class Ship:
     COOLDOWN = 10  # Cooldown time between laser shots
     HIT_INDICATOR_DURATION = 30  # Time the ship stays tinted red when hit
+    LASER_VEL = LASER_VEL  # Lasers fly down the screen
+    OWNER = OWNER_ENEMY  # Owner recorded on this ship's lasers
+    alive = True  # False once the ship has been destroyed
+    __slots__ = ("prev_x", "prev_y", "health", "ship_img", "laser_img", "lasers", "cool_down_counter", "hit_timer", "mask")
 
     def __init__(self, x, y, health=100):
         self.x = x  # X-coordinate of ship
         self.y = y  # Y-coordinate of ship
+        self.prev_x, self.prev_y = x, y  # Position at the start of the tick (for render interpolation)
         self.health = health  # Ship's health
         self.ship_img = None  # Placeholder for ship image
         self.laser_img = None  # Placeholder for laser image
@@ -205,28 +1404,25 @@ class Ship:
         self.cool_down_counter = 0  # Cooldown counter for shooting
         self.hit_timer = 0  # Timer for hit indicator (red tint)
 
-    def draw(self, window):
+    def save_position(self):
+        """Remember the current position as the previous one, for render interpolation."""
+        self.prev_x, self.prev_y = self.x, self.y
+
+    def update_hit_timer(self):
         if self.hit_timer > 0:  # If the ship has been hit
             self.hit_timer -= 1  # Decrease the hit timer
-            tinted_img = tint_image(self.ship_img, (255, 0, 0))  # Apply a red tint to the ship
-            window.blit(tinted_img, (self.x, self.y))  # Draw the tinted ship
-        else:
-            window.blit(self.ship_img, (self.x, self.y))  # Draw the normal ship
 
-        for laser in self.lasers:  # Draw all lasers shot by the ship
-            laser.draw(window)
-
-    def move_lasers(self, vel, obj):
+    def move_lasers(self, obj):
+        """Check this ship's lasers (already moved by the world) against obj and drop the spent ones."""
         self.cooldown()  # Handle the shooting cooldown
+        target_rect = bounding_rect(obj)  # Box around the target for the broad phase
         for laser in self.lasers:
-            laser.move(vel)  # Move the laser
-            if laser.off_screen(HEIGHT):  # Remove the laser if it goes off screen
-                self.lasers.remove(laser)
-            elif laser.collision(obj):  # Check for collision with an object
+            if laser.alive and bounding_rect(laser).colliderect(target_rect) and laser.collision(obj):  # Cheap box test before the mask test
                 obj.take_hit()  # If collision occurs, apply hit to the object
                 obj.health -= 10  # Decrease object's health
-                LASER_HIT_SOUND.play()  # Play the laser hit sound
-                self.lasers.remove(laser)  # Remove the laser after collision
+                SOUNDS.play("laser_hit")  # Play the laser hit sound
+                laser.alive = False  # Remove the laser after collision
+        self.lasers = [laser for laser in self.lasers if laser.alive]  # Drop hit and off-screen lasers in one pass
 
     def cooldown(self):
         if self.cool_down_counter >= self.COOLDOWN:  # If cooldown is complete
@@ -236,13 +1432,19 @@ class Ship:
 
     def shoot(self):
         if self.cool_down_counter == 0:  # If cooldown is complete
-            laser = Laser(self.x + self.get_width()//2, self.y, self.laser_img)  # Create a new laser
+            laser = LASER_POOL.acquire(self.x + self.get_width()//2, self.y, self.laser_img, vel=self.LASER_VEL, owner=self.OWNER)  # Create a new laser
             self.lasers.append(laser)  # Add the laser to the list of lasers
             self.cool_down_counter = 1  # Start the cooldown
 
     def take_hit(self):
         self.hit_timer = self.HIT_INDICATOR_DURATION  # Start the hit indicator timer
 
+    def destroy(self):
+        """Remove the ship together with the lasers it still has in flight."""
+        self.alive = False
+        for laser in self.lasers:
+            laser.alive = False
+
     def get_width(self):
         return self.ship_img.get_width()  # Return the width of the ship
 
@@ -251,12 +1453,16 @@ class Ship:
 
 # Player class, inheriting from Ship
 class Player(Ship):
+    LASER_VEL = -LASER_VEL  # The player's lasers fly up the screen
+    OWNER = OWNER_PLAYER
+
     def __init__(self, x, y, health=1000):
         super().__init__(x, y, health)  # Initialize the player with position and health
-        self.ship_img = MY_SHIP  # Set the player's ship image
-        self.laser_img = YELLOW_LASER  # Set the player's laser image
-        self.mask = pygame.mask.from_surface(self.ship_img)  # Create a mask for the ship
+        self.ship_img = ASSETS.image("MY_SHIP")  # Set the player's ship image
+        self.laser_img = ASSETS.image("YELLOW_LASER")  # Set the player's laser image
+        self.mask = ASSETS.mask("MY_SHIP")  # Shared mask for the ship
         self.max_health = health  # Store the player's maximum health
+        self.target_grid = SpatialHash()  # Broad phase for the player's lasers
 
         self.fuel = 0  # Initial fuel level (0% full)
         self.max_fuel = 100  # Maximum fuel level (100% full)
@@ -266,22 +1472,23 @@ class Player(Ship):
         self.target_fuel = 0  # Where we want the fuel to reach
         self.fuel_fill_speed = 1  # Control the speed of the fuel bar filling
 
-    def move_lasers(self, vel, objs):
+    def move_lasers(self, objs):
+        """Check the player's lasers (already moved by the world) against objs, drop the spent ones and return the kill count."""
         self.cooldown()  # Handle the shooting cooldown
-        for laser in self.lasers[:]:
-            laser.move(vel)  # Move the laser
-            if laser.off_screen(HEIGHT):  # If the laser goes off screen
-                self.lasers.remove(laser)
-            else:
-                for obj in objs:  # Check for collision with each object
+        self.target_grid.build(objs)  # Bucket the targets so each laser only checks the ones near it
+        kills = 0  # Objects destroyed this call
+        for laser in self.lasers:
+            if laser.alive:
+                for obj in self.target_grid.query(bounding_rect(laser)):  # Check for collision with each nearby object
+                    if not obj.alive:  # Already destroyed earlier this tick
+                        continue
                     if laser.collision(obj):
                         obj.take_hit()  # If collision occurs, apply hit
                         obj.health -= 200  # One-hit kill: laser deals 100 damage
-                        LASER_HIT_SOUND.play()  # Play hit sound
+                        SOUNDS.play("laser_hit")  # Play hit sound
                         if obj.health <= 0:  # If object's health reaches 0
-                            objs.remove(obj)  # Remove the object
-                            global score  # Increase score on enemy kill
-                            score += 100  # Add points to the score
+                            obj.destroy()  # Remove the object (dropped from objs below)
+                            kills += 1  # Count the kill for the score
 
                         # Smoothly fill the fuel bar when hitting enemies
                         self.target_fuel += 10  # Increase fuel target
@@ -289,15 +1496,19 @@ class Player(Ship):
                             self.target_fuel = self.max_fuel  # Cap fuel at max level
                             self.super_move_ready = True  # Super move ready once fuel is full
 
-                        if laser in self.lasers:  # Ensure the laser is removed after hit
-                            self.lasers.remove(laser)
+                        laser.alive = False  # Ensure the laser is removed after hit
+
+        self.lasers = [laser for laser in self.lasers if laser.alive]  # Drop hit and off-screen lasers in one pass
+        objs[:] = [obj for obj in objs if obj.alive]  # Drop destroyed objects in one pass
+        return kills  # Number of objects destroyed
 
     def shoot_super_laser(self):
         """Shoot the super laser only if fuel is full."""
         if self.super_move_ready:  # Ensure super move can only be used when ready
             # Play special attack sound effect
-            SPECIAL_ATTACK_SOUND.play()
-            laser = Laser(self.x + self.get_width()//2 - SUPER_LASER.get_width()//2, self.y - SUPER_LASER.get_height(), SUPER_LASER)  # Create the super laser
+            SOUNDS.play("special_attack")
+            super_laser = ASSETS.image("SUPER_LASER")  # Super laser image
+            laser = LASER_POOL.acquire(self.x + self.get_width()//2 - super_laser.get_width()//2, self.y - super_laser.get_height(), super_laser, vel=self.LASER_VEL, owner=self.OWNER)  # Create the super laser
             self.lasers.append(laser)  # Add the super laser to the player's lasers
             self.super_move_ready = False  # Reset super move availability
             self.fuel = 0  # Empty the fuel bar after using the super move
@@ -310,31 +1521,6 @@ class Player(Ship):
         elif self.fuel > self.target_fuel:
             self.fuel = self.target_fuel  # Clamp fuel to target
 
-    def draw(self, window):
-        super().draw(window)  # Draw the player ship and its lasers
-        self.healthbar(window)  # Draw the health bar
-        self.draw_fuel_bar(window)  # Draw the fuel bar on the screen
-
-    def healthbar(self, window): 
-        """Draw health bar below the ship."""
-        pygame.draw.rect(window, (255, 0, 0), (self.x, self.y + self.get_height() + 10, self.get_width(), 10))  # Draw red (empty) health bar
-        pygame.draw.rect(window, (0, 255, 0), 
-                         (self.x, self.y + self.get_height() + 10, self.get_width() * (self.health / self.max_health), 10))  # Draw green (filled) health bar
-
-    def draw_fuel_bar(self, window):
-        """Draw the fuel bar on the screen."""
-        fuel_bar_x = self.x  # X-coordinate for fuel bar
-        fuel_bar_y = self.y + self.ship_img.get_height() + 20  # Y-coordinate for fuel bar
-        fuel_bar_width = self.ship_img.get_width()  # Width of the fuel bar
-        fuel_bar_height = 10  # Height of the fuel bar
-
-        # Draw empty fuel bar (red background)
-        pygame.draw.rect(window, (255, 0, 0), (fuel_bar_x, fuel_bar_y, fuel_bar_width, fuel_bar_height))
-        
-        # Draw filled part of the fuel bar (blue foreground)
-        fuel_ratio = self.fuel / self.max_fuel  # Calculate fuel ratio
-        pygame.draw.rect(window, (0, 0, 255), (fuel_bar_x, fuel_bar_y, fuel_bar_width * fuel_ratio, fuel_bar_height))
-
     def collect_power_up(self, power_up):
         """Handle different types of power-ups."""
         if power_up.type == "health":
@@ -343,23 +1529,23 @@ class Player(Ship):
             self.target_fuel = min(self.max_fuel, self.target_fuel + 50)  # Increase fuel by 50
         elif power_up.type == "shield":
             # Placeholder for shield effect, could be implemented as extra hit points or temporary invincibility
-            print("Shield power-up collected!")
+            pass  # No print: this runs inside the simulation, thousands of times in headless and batch runs
 
 # PowerUp class to handle power-up behavior
 class PowerUp:
+    __slots__ = ("x", "y", "prev_x", "prev_y", "type", "img", "mask")  # Power-ups are pooled
+
     def __init__(self, x, y, type):
         self.x = x  # X-coordinate of power-up
         self.y = y  # Y-coordinate of power-up
+        self.prev_x, self.prev_y = x, y  # Position at the start of the tick (for render interpolation)
         self.type = type  # Power-up type (health, fuel, shield)
-        if self.type == "health":
-            self.img = pygame.image.load(os.path.join("assets", "healthOrb.png.png"))  # Load health power-up image
-        else:
-            self.img = pygame.image.load(os.path.join("assets", "bluorb.png"))  # Load fuel power-up image
-        self.img = pygame.transform.scale(self.img, (50, 50))  # Scale the power-up image
-        self.mask = pygame.mask.from_surface(self.img)  # Create a mask for collision detection
+        image_name = "HEALTH_ORB" if self.type == "health" else "FUEL_ORB"  # Health or fuel power-up image
+        self.img = ASSETS.image(image_name)  # Shared, already scaled power-up image
+        self.mask = ASSETS.mask(image_name)  # Shared mask for collision detection
 
-    def draw(self, window):
-        window.blit(self.img, (self.x, self.y))  # Draw the power-up on the screen
+    def save_position(self):
+        self.prev_x, self.prev_y = self.x, self.y
 
     def move(self, vel):
         self.y += vel  # Move the power-up downwards by the given velocity
@@ -368,49 +1554,86 @@ class PowerUp:
         return collide(self, obj)  # Check if the power-up collides with the player
 
 # Function to spawn random power-ups
-def spawn_power_up():
+def spawn_power_up(rng=random):
     power_up_types = ["health", "shield", "fuel"]  # Define available power-up types
-    chosen_power_up = random.choice(power_up_types)  # Randomly select a power-up type
-    return PowerUp(random.randrange(50, WIDTH - 50), random.randrange(-1000, -100), chosen_power_up)  # Return a new power-up object at a random position
+    chosen_power_up = rng.choice(power_up_types)  # Randomly select a power-up type
+    return POWER_UP_POOL.acquire(rng.randrange(50, WIDTH - 50), rng.randrange(-1000, -100), chosen_power_up)  # Return a pooled power-up at a random position
 
 # Enemy class, inheriting from Ship
 class Enemy(Ship):
     COLOR_MAP = {
-        "red": (RED_SPACE_SHIP, RED_LASER),  # Red ship and laser
-        "green": (GREEN_SPACE_SHIP, GREEN_LASER),  # Green ship and laser
-        "blue": (BLUE_SPACE_SHIP, BLUE_LASER),  # Blue ship and laser
-        "black": (BLACK_SPACE_SHIP, BLACK_LASER) 
+        "red": ("RED_SPACE_SHIP", "RED_LASER"),  # Red ship and laser
+        "green": ("GREEN_SPACE_SHIP", "GREEN_LASER"),  # Green ship and laser
+        "blue": ("BLUE_SPACE_SHIP", "BLUE_LASER"),  # Blue ship and laser
+        "black": ("BLACK_SPACE_SHIP", "BLACK_LASER")  # Black ship and laser
     }
 
-    def __init__(self, x, y, color):
-        super().__init__(x, y, health=10)  # Normal enemies have 10 health (die in one hit)
-        self.ship_img, self.laser_img = self.COLOR_MAP[color]  # Assign the ship and laser images based on color
-        self.mask = pygame.mask.from_surface(self.ship_img)  # Create a mask for the ship
+    __slots__ = ("store", "slot")  # Position and liveness live in the world arrays
 
-    def move(self, vel):
-        self.y += vel  # Move the enemy downwards by the given velocity
+    x = stored("x")  # X-coordinate of enemy
+    y = stored("y")  # Y-coordinate of enemy
+    prev_x = stored("prev_x")  # Position at the start of the tick
+    prev_y = stored("prev_y")
+    alive = stored("alive")  # False once the enemy has been destroyed
+
+    def __init__(self, x, y, color, vel=1):
+        ship_name, laser_name = self.COLOR_MAP[color]  # Ship and laser assets for this color
+        world.enemies.add(self, x, y, vel, OWNER_ENEMY, ASSETS.image(ship_name).get_height())  # Position and velocity live in the world arrays
+        super().__init__(x, y, health=10)  # Normal enemies have 10 health (die in one hit)
+        self.ship_img = ASSETS.image(ship_name)  # Assign the ship image
+        self.laser_img = ASSETS.image(laser_name)  # Assign the laser image
+        self.mask = ASSETS.mask(ship_name)  # Shared mask for the ship
 
     def shoot(self):
         if self.cool_down_counter == 0:  # If cooldown is complete
-            laser = Laser(self.x - 20, self.y, self.laser_img)  # Create a new laser
+            laser = LASER_POOL.acquire(self.x - 20, self.y, self.laser_img, vel=self.LASER_VEL, owner=self.OWNER)  # Create a new laser
             self.lasers.append(laser)  # Add the laser to the enemy's lasers
             self.cool_down_counter = 1  # Start the cooldown
 
+# Pools for the short-lived entities, preallocated to the peaks of the benchmark scenarios
+LASER_POOL = ObjectPool(Laser, 1024)  # A saturated laser field peaks near 900
+ENEMY_POOL = ObjectPool(Enemy, 256)  # A level 40 wave is about 200 enemies
+POWER_UP_POOL = ObjectPool(PowerUp, 8)  # Rarely more than one at a time
+world.projectiles.pool = LASER_POOL  # Dead rows go back to the pools when the world is compacted
+world.enemies.pool = ENEMY_POOL
+
+# Function to create another world, for running several games in one process
+def make_world():
+    entity_world = EntityWorld()
+    entity_world.projectiles.pool = LASER_POOL
+    entity_world.enemies.pool = ENEMY_POOL
+    return entity_world
+
+# Function to switch the world the game logic works on (GameState and the entities use the module's world)
+def use_world(entity_world):
+    global world
+    world = entity_world
+
+# Function to describe how the pools are doing
+def pool_report():
+    lines = []
+    for name, pool in (("lasers", LASER_POOL), ("enemies", ENEMY_POOL), ("power-ups", POWER_UP_POOL)):
+        stats = pool.stats()
+        lines.append(f"{name} {stats['in_use']}/{stats['size']} in use (peak {stats['peak']}, {stats['misses']} misses)")
+    return "Pools: " + ", ".join(lines)
+
 # Boss class, inheriting from Ship
 class Boss(Ship):
     BOSS_COOLDOWN = 50  # 5 seconds cooldown (at 60 FPS)
+    SHOT_ANGLES = (-30, 0, 30)  # Angles of the three lasers in each volley
+    OWNER = OWNER_BOSS
 
     def __init__(self, x, y, health=30000):
         super().__init__(x, y, health)  # Initialize the boss with large health
-        self.ship_img = pygame.transform.scale(pygame.image.load(os.path.join("assets", "BOSS_DIDDY.png")), (150, 150))  # Load and scale the boss image
-        self.laser_img = DIDDY_LASER  # Assign the laser image for the boss
-        self.mask = pygame.mask.from_surface(self.ship_img)  # Create a mask for the boss
+        self.ship_img = ASSETS.image("BOSS_SHIP")  # Set the boss image
+        self.laser_img = ASSETS.image("DIDDY_LASER")  # Assign the laser image for the boss
+        self.mask = ASSETS.mask("BOSS_SHIP")  # Shared mask for the boss
         self.max_health = health  # Store the boss's maximum health
         self.boss_cool_down_counter = 0  # Cooldown counter for the boss's attacks
 
-    def move(self, vel):
+    def move(self, vel, rng=random):
         # Randomly move the boss in one of the four directions
-        direction = random.choice(['up', 'down', 'left', 'right'])
+        direction = rng.choice(['up', 'down', 'left', 'right'])
 
         if direction == 'up' and self.y - vel > 0:
             self.y -= vel  # Move up
@@ -421,18 +1644,10 @@ class Boss(Ship):
         if direction == 'right' and self.x + vel + self.get_width() < WIDTH:
             self.x += vel  # Move right
 
-    def draw(self, window):
-        super().draw(window)  # Draw the boss and its lasers
-        self.healthbar(window)  # Draw the boss's health bar
-
-    def healthbar(self, window):
-        pygame.draw.rect(window, (255, 0, 0), (self.x, self.y + self.get_height() + 10, self.get_width(), 10))  # Draw the red (empty) health bar
-        pygame.draw.rect(window, (0, 255, 0), (self.x, self.y + self.get_height() + 10, self.get_width() * (self.health / self.max_health), 10))  # Draw the green (filled) health bar
-
     def boss_shoot(self):
         if self.boss_cool_down_counter == 0:  # If cooldown is complete
-            for angle in [-30, 0, 30]:  # Shoot lasers at three angles (-30, 0, +30 degrees)
-                laser = Laser(self.x + self.get_width() // 2 - 10, self.y + self.get_height(), pygame.transform.rotate(self.laser_img, angle))  # Rotate the laser by the angle
+            for angle in self.SHOT_ANGLES:  # Shoot lasers at three angles (-30, 0, +30 degrees)
+                laser = LASER_POOL.acquire(self.x + self.get_width() // 2 - 10, self.y + self.get_height(), self.laser_img, angle, self.LASER_VEL, self.OWNER)  # Laser rotated by the angle
                 self.lasers.append(laser)  # Add the laser to the boss's lasers
             self.boss_cool_down_counter = 1  # Start the cooldown
 
@@ -443,220 +1658,1305 @@ class Boss(Ship):
             self.boss_cool_down_counter += 1  # Increment the cooldown counter
 
 # Function to spawn a boss at specific levels
-def spawn_boss(level):
+def spawn_boss(level, base_health=30000, health_step=5000):
     if level % 5 == 0:  # Spawn a boss every 5 levels
-        health = 30000 + (level // 5) * 5000  # Increase boss health with each boss
+        health = base_health + (level // 5) * health_step  # Increase boss health with each boss
         return Boss(WIDTH // 2 - 75, -100, health)  # Return a new boss object
     return None
 
+# Function to build the hit tint of every ship sprite up front
+def prewarm_tint_cache():
+    """Fill the tint cache with the hit variants of the enemy, player and boss sprites."""
+    ship_names = [ship_name for ship_name, _ in Enemy.COLOR_MAP.values()] + ["MY_SHIP", "BOSS_SHIP"]  # Enemies, player and boss
+    TINT_CACHE.prewarm([ASSETS.image(name) for name in ship_names])
+
+# Function to build every projectile template up front
+def prewarm_projectile_templates():
+    """Precompute the laser templates for every ship, including the boss's rotated volley."""
+    laser_names = [laser_name for _, laser_name in Enemy.COLOR_MAP.values()] + ["YELLOW_LASER", "SUPER_LASER"]
+    for name in laser_names:
+        projectile_template(ASSETS.image(name))
+    for angle in Boss.SHOT_ANGLES:
+        projectile_template(ASSETS.image("DIDDY_LASER"), angle)
+
+# Function to compare asset loading costs
+def measure_asset_timing(spawns=200):
+    """Print what startup costs (the menu's background prefetch, and --prewarm) and per-spawn costs with the asset registry versus loading from disk."""
+    for atlas in (None, ASSETS.atlas):
+        registry = AssetRegistry(ASSETS.folder, atlas)  # Fresh registry so every load is cold
+        registry.specs = dict(ASSETS.specs)
+        start = time.perf_counter()
+        registry.prefetch()  # What the menu does when it starts
+        menu_start = time.perf_counter() - start
+        registry.prefetch_thread.join()
+        prefetched = time.perf_counter() - start
+        source = f"from the atlas ({len(registry.atlas_sprites())} sprites)" if atlas else "from separate files"
+        print(f"Startup {source}: menu waits {menu_start * 1000:.2f} ms, "
+              f"{len(registry.specs)} assets prefetched in the background in {prefetched * 1000:.1f} ms")
+        for name, ms in sorted(registry.report().items(), key=lambda item: -item[1]):
+            print(f"  {name:<18} {ms:8.2f} ms")
+
+    start = time.perf_counter()
+    prewarm_tint_cache()
+    prewarm_projectile_templates()
+    print(f"--prewarm adds {(time.perf_counter() - start) * 1000:.1f} ms before the menu (the tints and lasers are otherwise built on first use)")
+
+    def per_spawn(spawn):
+        start = time.perf_counter()
+        for _ in range(spawns):
+            spawn()
+        return (time.perf_counter() - start) / spawns * 1000
+
+    def disk_power_up():  # What PowerUp.__init__ used to do on every spawn
+        image = pygame.transform.scale(pygame.image.load(os.path.join("assets", "bluorb.png")), (50, 50))
+        pygame.mask.from_surface(image)
+
+    def disk_boss():  # What Boss.__init__ used to do on every spawn
+        image = pygame.transform.scale(pygame.image.load(os.path.join("assets", "BOSS_DIDDY.png")), (150, 150))
+        pygame.mask.from_surface(image)
+
+    print("Per spawn (registry vs. loading from disk):")
+    print(f"  PowerUp  {per_spawn(lambda: PowerUp(0, 0, 'fuel')):.3f} ms vs {per_spawn(disk_power_up):.3f} ms")
+    print(f"  Boss     {per_spawn(lambda: Boss(0, 0)):.3f} ms vs {per_spawn(disk_boss):.3f} ms")
+    print(f"  Enemy    {per_spawn(lambda: Enemy(0, 0, 'red')):.3f} ms")
+
+# Function to get the screen-space box around an object's sprite
+def bounding_rect(obj):
+    """Return the box around obj's sprite (lasers use the tight box around their opaque pixels)."""
+    if isinstance(obj, Laser):
+        return obj.rect.move(int(obj.x), int(obj.y))
+    width, height = obj.mask.get_size()
+    return pygame.Rect(int(obj.x) - 1, int(obj.y) - 1, width + 2, height + 2)  # 1px margin for fractional positions
+
+# Broad phase for collisions: a uniform grid of buckets
+class SpatialHash:
+    """Uniform grid that buckets objects by their boxes so collision checks only visit nearby pairs."""
+
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size  # Width and height of one grid cell in pixels
+        self.cells = {}  # (column, row) -> list of (object, box)
+
+    def cells_for(self, rect):
+        """Yield the grid cells that rect touches."""
+        size = self.cell_size
+        for column in range(rect.left // size, (rect.right - 1) // size + 1):
+            for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield column, row
+
+    def build(self, objs):
+        """Replace the grid contents with objs."""
+        self.cells.clear()
+        for obj in objs:
+            self.insert(obj)
+
+    def insert(self, obj):
+        """Add obj to every cell its box touches."""
+        rect = bounding_rect(obj)
+        for cell in self.cells_for(rect):
+            self.cells.setdefault(cell, []).append((obj, rect))
+
+    def query(self, rect):
+        """Return the objects whose boxes overlap rect, each once, in insertion order per cell."""
+        found = []
+        seen = set()
+        for cell in self.cells_for(rect):
+            for obj, obj_rect in self.cells.get(cell, ()):
+                if id(obj) not in seen and obj_rect.colliderect(rect):  # Cheap box test
+                    seen.add(id(obj))
+                    found.append(obj)
+        return found
+
 # Function to detect collision between two objects
 def collide(obj1, obj2):
     offset_x = obj2.x - obj1.x  # Calculate x-offset between objects
     offset_y = obj2.y - obj1.y  # Calculate y-offset between objects
     return obj1.mask.overlap(obj2.mask, (offset_x, offset_y)) != None  # Return True if masks overlap, indicating a collision
 
+# Keys the game reads each tick
+Inputs = namedtuple("Inputs", ["up", "left", "down", "right", "boost", "shoot", "super", "enter"])
+NO_INPUTS = Inputs(False, False, False, False, False, False, False, False)  # Nothing pressed
+
+# Function to read the game's keys from the keyboard
+def read_inputs():
+    keys = pygame.key.get_pressed()  # Get the pressed keys
+    return Inputs(keys[pygame.K_w], keys[pygame.K_a], keys[pygame.K_s], keys[pygame.K_d],
+                  keys[pygame.K_LSHIFT], keys[pygame.K_SPACE], keys[pygame.K_k], keys[pygame.K_RETURN])
+
+# Frame scheduler: caps each scene's frame rate, sleeps in the event queue when nothing moves, and notices when the window is in the background
+class FrameScheduler:
+    SCENE_FPS = {"menu": 60, "game_over": 30}  # Frame rate caps (the game runs at RENDER_FPS)
+    IDLE_TIMEOUT_MS = 250  # Longest an idle scene sleeps in the event queue before looking again
+
+    def __init__(self):
+        self.focused = True  # Whether the window has keyboard focus
+        self.minimized = False  # Whether the window is minimized or hidden
+        self.scene = None  # Scene being timed
+        self.scene_start = None  # (wall clock, process CPU time) when the scene was entered
+        self.cpu_seconds = {}  # Scene -> CPU time of the whole process (decoder threads included)
+        self.wall_seconds = {}  # Scene -> time spent in it
+
+    def active(self):
+        """Whether the window is in the foreground (scenes pause their video and the game when it isn't)."""
+        return self.focused and not self.minimized
+
+    def frame_rate(self, scene):
+        cap = self.SCENE_FPS.get(scene)
+        if cap is None:
+            return RENDER_FPS
+        return cap if RENDER_FPS == 0 else min(cap, RENDER_FPS)
+
+    def idle_timeout(self, animating):
+        """Milliseconds to block waiting for events: none while something moves on screen."""
+        return 0 if animating and self.active() else self.IDLE_TIMEOUT_MS
+
+    def watch(self, events):
+        """Follow the window's focus and minimized state."""
+        for event in events:
+            if event.type == pygame.WINDOWFOCUSLOST:
+                self.focused = False
+            elif event.type == pygame.WINDOWFOCUSGAINED:
+                self.focused = True
+            elif event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+                self.minimized = True
+            elif event.type in (pygame.WINDOWRESTORED, pygame.WINDOWSHOWN, pygame.WINDOWMAXIMIZED):
+                self.minimized = False
+
+    def enter(self, scene):
+        """Start charging time to scene."""
+        self.leave()
+        self.scene = scene
+        self.scene_start = (time.perf_counter(), time.process_time())
+
+    def leave(self):
+        if self.scene is None:
+            return
+        wall, cpu = self.scene_start
+        self.wall_seconds[self.scene] = self.wall_seconds.get(self.scene, 0.0) + time.perf_counter() - wall
+        self.cpu_seconds[self.scene] = self.cpu_seconds.get(self.scene, 0.0) + time.process_time() - cpu
+        self.scene = None
+
+    def report(self):
+        lines = [f"{scene} {self.cpu_seconds[scene]:.2f} s CPU in {wall:.2f} s ({self.cpu_seconds[scene] / wall:.0%})"
+                 for scene, wall in self.wall_seconds.items() if wall > 0]
+        return "CPU time: " + (", ".join(lines) if lines else "no scenes run")
+
+
+SCHEDULER = FrameScheduler()  # Shared by every scene
+
+# Keys the game reacts to, and the actions that count once per press rather than while held
+GAME_KEYS = {pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_LSHIFT, pygame.K_SPACE, pygame.K_k, pygame.K_RETURN}
+EDGE_ACTIONS = {pygame.K_SPACE: "shoot", pygame.K_k: "super", pygame.K_RETURN: "start", pygame.K_r: "restart", pygame.K_q: "quit"}
+
+# Input pipeline: events are read right before the simulation, and every key press is timed until it is on screen
+class InputPipeline:
+    def __init__(self, history=1000):
+        self.held = NO_INPUTS  # Keys held down when the events were last read
+        self.pressed = set()  # Edge actions pressed since they were last taken
+        self.pending = []  # Read times of game key presses no tick has simulated yet
+        self.simulated = []  # Read times of key presses simulated but not yet on screen
+        self.latencies = deque(maxlen=history)  # Seconds from reading a key press to the display update showing it
+
+    def pump(self, timeout=0):
+        """Read every waiting event (blocking up to timeout milliseconds for the first), latch the key presses and return the events for the scene to handle."""
+        events = []
+        if timeout:
+            first = pygame.event.wait(timeout)  # Sleep until something happens instead of redrawing a still screen
+            if first.type != pygame.NOEVENT:
+                events.append(first)
+        now = time.perf_counter()  # SDL's own event timestamps aren't exposed by pygame, so presses are timed from here
+        events += pygame.event.get()
+        SCHEDULER.watch(events)
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                action = EDGE_ACTIONS.get(event.key)
+                if action is not None:
+                    self.pressed.add(action)
+                if event.key in GAME_KEYS:
+                    self.pending.append(now)
+        self.held = read_inputs()
+        return events
+
+    def tick_inputs(self):
+        """Inputs for the next tick: the held keys, plus any shot or super move pressed since the last tick (even if already released)."""
+        inputs = self.held
+        if self.pressed:
+            shoot, super_move = self.take("shoot"), self.take("super")
+            if shoot or super_move:
+                inputs = inputs._replace(shoot=inputs.shoot or shoot, super=inputs.super or super_move)
+        if self.pending:
+            self.simulated += self.pending
+            self.pending.clear()
+        return inputs
+
+    def take(self, action):
+        """Return whether action was pressed since it was last taken (each press is taken once)."""
+        if action in self.pressed:
+            self.pressed.discard(action)
+            return True
+        return False
+
+    def displayed(self):
+        """Call right after the display update: the key presses simulated so far are now on screen."""
+        if self.simulated:
+            now = time.perf_counter()
+            self.latencies.extend(now - read_time for read_time in self.simulated)
+            self.simulated.clear()
+
+    def clear(self):
+        """Forget presses from the previous scene."""
+        self.pressed.clear()
+        self.pending.clear()
+        self.simulated.clear()
+
+    def latency_percentiles(self):
+        """Return the p50, p95 and p99 input-to-display latency in milliseconds (None before any input)."""
+        if not self.latencies:
+            return None
+        p50, p95, p99 = np.percentile(np.array(self.latencies) * 1000, [50, 95, 99])
+        return {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2)}
+
+    def report(self):
+        latency = self.latency_percentiles()
+        if latency is None:
+            return "Input latency: no key presses"
+        return f"Input latency: p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms over {len(self.latencies)} key presses"
+
+
+INPUT = InputPipeline()  # Keyboard input of every scene
+
 # Function to handle player movement based on key input
-def handle_movement(keys, player, player_vel):
+def handle_movement(inputs, player, player_vel):
     move_speed = player_vel  # Default movement speed
-    if keys[pygame.K_LSHIFT]:  # Boost speed when "Shift" is pressed
+    if inputs.boost:  # Boost speed when "Shift" is pressed
         move_speed = player_vel * 1.5  # 50% speed increase
 
-    if keys[pygame.K_a] and player.x - move_speed > 0:  # Move left
+    if inputs.left and player.x - move_speed > 0:  # Move left
         player.x -= move_speed
-    if keys[pygame.K_d] and player.x + move_speed + player.get_width() < WIDTH:  # Move right
+    if inputs.right and player.x + move_speed + player.get_width() < WIDTH:  # Move right
         player.x += move_speed
-    if keys[pygame.K_w] and player.y - move_speed > 0:  # Move up
+    if inputs.up and player.y - move_speed > 0:  # Move up
         player.y -= move_speed
-    if keys[pygame.K_s] and player.y + move_speed + player.get_height() + 15 < HEIGHT:  # Move down
+    if inputs.down and player.y + move_speed + player.get_height() + 15 < HEIGHT:  # Move down
         player.y += move_speed
 
-# Main game function
-def main():
-    run = True  # Boolean to control the main game loop
-    FPS = 60  # Frames per second
-    level = 0  # Initial game level
-    lives = 10  # Initial number of lives
-    global score  # Declare score as global variable
-    score = 0  # Initialize score to 0
-    main_font = pygame.font.SysFont("system", 50)  # Font for main game labels
-    lost_font = pygame.font.SysFont("system", 60)  # Font for "You Lost" message
-    warning_font = pygame.font.SysFont("system", 80)  # Font for boss warning message
-
-    enemies = []  # List to hold enemy ships
-    wave_length = 5  # Initial wave length (number of enemies)
-    enemy_vel = 1  # Initial enemy movement speed
-
-    player_vel = 10  # Player movement speed
-    laser_vel = 5  # Laser movement speed
-    boss_vel = 2  # Boss movement speed
-
-    player = Player(300, 630)  # Initialize player ship at (300, 630)
-
-    clock = pygame.time.Clock()  # Create a clock to control frame rate
-
-    lost = False  # Boolean to track if the player has lost
-    lost_count = 0  # Counter for how long the lost message is shown
-
-    boss_spawned = False  # Track if the boss has been spawned
-    boss = None  # Boss object (None if no boss is present)
-    boss_warning_displayed = False  # Track if the boss warning is being displayed
-    boss_warning_timer = 0  # Timer for how long the boss warning is shown
-
-    power_ups = []  # List to hold power-ups
-
-    # Play game background music in a loop
-    pygame.mixer.music.load(GAME_MUSIC)  # Load the game background music
-    pygame.mixer.music.play(-1)  # Play the music indefinitely
-
-    # Function to redraw the game window
-    def redraw_window():
-        video_frame = get_video_frame(game_cap)  # Get the current frame from the game background video
-        WIN.blit(video_frame, (0, 0))  # Draw the video frame on the window
-
-        # Render the game status labels
-        lives_label = main_font.render(f"Health: {lives}", 1, (255, 255, 255))  # Health label
-        level_label = main_font.render(f"Level: {level}", 1, (255, 255, 255))  # Level label
-        score_label = main_font.render(f"Score: {score}", 1, (255, 255, 255))  # Score label
-
-        # Display the labels on the screen
-        WIN.blit(lives_label, (10, 10))  # Top left corner for lives
-        WIN.blit(level_label, (WIDTH - level_label.get_width() - 10, 10))  # Top right corner for level
-        WIN.blit(score_label, (WIDTH // 2 - score_label.get_width() // 2, 10))  # Center for score
-
-        for enemy in enemies:  # Draw each enemy on the screen
-            enemy.draw(WIN)
-
-        player.draw(WIN)  # Draw the player ship and its health/fuel bars
-
-        for power_up in power_ups:  # Draw each power-up on the screen
-            power_up.draw(WIN)
 
-        if boss_spawned:  # If a boss is present
-            boss.draw(WIN)  # Draw the boss
-
-        if boss_warning_displayed:  # If the boss warning is being displayed
-            warning_label = warning_font.render("Boss Incoming!", 1, (255, 0, 0))  # Render the boss warning text
-            WIN.blit(warning_label, (WIDTH // 2 - warning_label.get_width() // 2, HEIGHT // 2))  # Center the warning text
-
-        if lost:  # If the player has lost
-            lost_label = lost_font.render("You Lost!!", 1, (255, 255, 255))  # Render "You Lost" message
-            WIN.blit(lost_label, (WIDTH / 2 - lost_label.get_width() / 2, 350))  # Center the lost message
-
-        pygame.display.update()  # Update the display with the new frame
-
-    while run:  # Main game loop
-        clock.tick(FPS)  # Control the game frame rate
-        redraw_window()  # Redraw the window each frame
-
-        if lives <= 0 or player.health <= 0:  # If the player runs out of lives or health
-            lost = True  # Set lost to True
-            lost_count += 1  # Increment lost count
-
-        if lost:  # If the player has lost
-            if lost_count > FPS * 3:  # After 3 seconds, show the game over screen
-                game_over_screen()  # Call the game over screen
-
-        if len(enemies) == 0 and not boss_spawned:  # If no enemies are left and no boss is present
-            level += 1  # Increment the level
-            wave_length += 5  # Increase the wave length (number of enemies)
-            enemy_vel += 0 * (level // 2)  # Increase enemy speed every 2 levels
-            for i in range(wave_length):  # Spawn new enemies for the new wave
-                enemy = Enemy(random.randrange(50, WIDTH - 100), random.randrange(-1500, -100), random.choice(["red", "blue", "green", "black"]))  # Random enemy color
-                enemies.append(enemy)  # Add the enemy to the list
-
-            # Spawn a power-up randomly with a 30% chance
-            if random.random() < 0.5:
-                power_ups.append(spawn_power_up())  # Add a power-up to the list
-
-            # Spawn a boss if it's a boss level
-            if not boss_spawned and level % 5 == 0:  # Show warning before boss spawn
-                boss_warning_displayed = True  # Show the boss warning
-                boss_warning_timer = FPS * 3  # Display warning for 3 seconds
-                boss_spawned = True  # Indicate that a boss has spawned
-                boss = spawn_boss(level)  # Spawn the boss
-
-        # Event handling loop
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:  # If the user closes the window
-                run = False  # Exit the game loop
-
-        keys = pygame.key.get_pressed()  # Get the pressed keys
-        handle_movement(keys, player, player_vel)  # Handle player movement
-
-        if keys[pygame.K_SPACE]:  # If space bar is pressed, shoot lasers
+# Input replays: the seed, then one byte per tick with a bit per key (in Inputs field order)
+REPLAY_MAGIC = b"SDREPLAY"  # Identifies a replay file
+REPLAY_VERSION = 1  # Bump when the file layout changes
+REPLAY_HEADER = struct.Struct("<8sIq")  # magic, version, seed
+REPLAY_FOOTER = struct.Struct("<4sqqq")  # b"DONE", final level, final score, ticks (written when the game ends)
+INPUTS_BY_BYTE = [Inputs(*(bool(byte >> bit & 1) for bit in range(8))) for byte in range(256)]  # Decoded once
+
+def pack_inputs(inputs):
+    """Return the inputs as one byte, bit n set when field n of Inputs is pressed."""
+    byte = 0
+    for bit, pressed in enumerate(inputs):
+        if pressed:
+            byte |= 1 << bit
+    return byte
+
+
+# Recorder that writes a replay while a game is played
+class ReplayRecorder:
+    def __init__(self, path, seed):
+        self.file = open(path, "wb")
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed))
+        self.ticks = 0
+
+    def record(self, inputs):
+        self.file.write(bytes((pack_inputs(inputs),)))  # Buffered by the file, so this stays cheap
+        self.ticks += 1
+
+    def close(self, state=None):
+        """Finish the file, noting the final level and score so playback can check it ends the same way."""
+        if state is not None and state.tick == self.ticks:
+            self.file.write(REPLAY_FOOTER.pack(b"DONE", state.level, state.score, self.ticks))
+        self.file.close()
+
+
+# A recorded game: its seed, its inputs and (if it finished recording) how it ended
+class Replay:
+    def __init__(self, path):
+        with open(path, "rb") as replay_file:
+            data = replay_file.read()
+        magic, version, self.seed = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} Space Diddler replay")
+        body = data[REPLAY_HEADER.size:]
+
+        self.outcome = None  # (level, score) the recorded game ended with, if known
+        if len(body) >= REPLAY_FOOTER.size:
+            tag, level, score, ticks = REPLAY_FOOTER.unpack_from(body, len(body) - REPLAY_FOOTER.size)
+            if tag == b"DONE" and ticks == len(body) - REPLAY_FOOTER.size:
+                self.outcome = (level, score)
+                body = body[:ticks]
+        self.inputs = body  # One byte per tick
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def policy(self, state):
+        """Inputs for the tick state is about to run (nothing pressed after the recording ends)."""
+        if state.tick < len(self.inputs):
+            return INPUTS_BY_BYTE[self.inputs[state.tick]]
+        return NO_INPUTS
+
+    def check(self, state):
+        """Return whether state ended the way the recording did (None if the recording doesn't say)."""
+        if self.outcome is None:
+            return None
+        return (state.level, state.score) == self.outcome
+
+
+REPLAY_RECORD_PATH = None  # Record each game to this file (numbered after the first), set by --record
+REPLAY_PLAY = None  # Replay to play instead of reading the keyboard, set by --replay
+recorded_games = 0  # Games recorded so far
+
+# Function to find the file a game's replay is recorded to
+def replay_record_path(game_number):
+    if game_number == 1:
+        return REPLAY_RECORD_PATH
+    root, extension = os.path.splitext(REPLAY_RECORD_PATH)
+    return f"{root}-{game_number}{extension}"
+
+
+# Save states: the whole game as a compact binary snapshot, for rewinding and for starting from the middle of a game
+SNAPSHOT_MAGIC = b"SDSTATE\x00"  # Identifies a save-state file
+SNAPSHOT_VERSION = 1  # Bump when the layout changes
+SNAPSHOT_HEADER = struct.Struct("<8sI")  # magic, version
+SNAPSHOT_GAME = struct.Struct("<qqiiiiiiiiqiii?????bbIIII")  # GameState scalars and the entity counts that follow
+SNAPSHOT_PLAYER = struct.Struct("<ddddiiiiiii?")  # Position, previous position, health, max health, cooldown, hit timer, fuel, target fuel, fill speed, super ready
+SNAPSHOT_BOSS = struct.Struct("<ddddiiiii")  # Position, previous position, health, max health, cooldown, hit timer, volley cooldown
+SNAPSHOT_RNG = struct.Struct("<dQQQQQQ")  # random's Gaussian spare (NaN if none), then NumPy's PCG64 state, increment and spare
+SNAPSHOT_CAUSES = (None, "escaped", "rammed", "boss", "shot")  # Life-loss and death causes by code
+SNAPSHOT_SPRITES = ("YELLOW_LASER", "SUPER_LASER", "RED_LASER", "GREEN_LASER", "BLUE_LASER", "BLACK_LASER", "DIDDY_LASER")  # Laser sprites by code
+SNAPSHOT_COLORS = tuple(Enemy.COLOR_MAP)  # Enemy colors by code
+SNAPSHOT_POWER_UPS = ("health", "shield", "fuel")  # Power-up types by code
+
+# One row per entity; sprites, masks and templates are stored as codes and shared again on restore
+ENEMY_RECORD = np.dtype([("x", "<f8"), ("y", "<f8"), ("prev_x", "<f8"), ("prev_y", "<f8"), ("vel", "<f8"),
+                         ("color", "u1"), ("health", "<i4"), ("cool_down", "<i4"), ("hit_timer", "<i4")])
+LASER_RECORD = np.dtype([("x", "<f8"), ("y", "<f8"), ("prev_x", "<f8"), ("prev_y", "<f8"), ("vel", "<f8"),
+                         ("owner", "i1"), ("sprite", "u1"), ("angle", "<i2"), ("shooter", "<i4")])  # shooter: enemy index, -1 player, -2 boss
+POWER_UP_RECORD = np.dtype([("x", "<f8"), ("y", "<f8"), ("prev_x", "<f8"), ("prev_y", "<f8"), ("type", "u1")])
+BOSS_KILL_RECORD = np.dtype([("level", "<i4"), ("ticks", "<i4")])
+
+snapshot_codes = {}  # Shared surface -> code (ship image -> color code, laser template image -> (sprite code, angle))
+
+def snapshot_code(image):
+    """Return the code of a shared ship or laser surface."""
+    code = snapshot_codes.get(image)
+    if code is None:  # A template built since the table was last filled
+        for color_code, color in enumerate(SNAPSHOT_COLORS):
+            snapshot_codes[ASSETS.image(Enemy.COLOR_MAP[color][0])] = color_code
+        sprite_codes = {ASSETS.image(name): sprite_code for sprite_code, name in enumerate(SNAPSHOT_SPRITES)}
+        for (source, angle), template in projectile_templates.items():
+            if source in sprite_codes:
+                snapshot_codes[template.img] = (sprite_codes[source], angle)
+        code = snapshot_codes[image]
+    return code
+
+
+# Function to capture a game as bytes
+def snapshot(state):
+    """Serialize everything step() depends on; the sprites are referred to by code, never copied."""
+    enemies, player, boss = state.enemies, state.player, state.boss
+    enemy_rows = np.empty(len(enemies), ENEMY_RECORD)
+    if enemies:
+        colors = list(map(snapshot_codes.get, [enemy.ship_img for enemy in enemies]))
+        enemy_rows["color"] = colors if None not in colors else [snapshot_code(enemy.ship_img) for enemy in enemies]
+        enemy_rows["health"] = [enemy.health for enemy in enemies]
+        enemy_rows["cool_down"] = [enemy.cool_down_counter for enemy in enemies]
+        enemy_rows["hit_timer"] = [enemy.hit_timer for enemy in enemies]
+        rows = [enemy.slot for enemy in enemies]
+        store = world.enemies
+        for column in ("x", "y", "prev_x", "prev_y", "vel"):
+            enemy_rows[column] = getattr(store, column)[rows]
+
+    groups = [player.lasers] + ([boss.lasers] if boss is not None else []) + [enemy.lasers for enemy in enemies]
+    shooter_ids = [-1] + ([-2] if boss is not None else []) + list(range(len(enemies)))  # Who fired each group, so lasers go back into the right list
+    lasers = [laser for group in groups for laser in group]
+    laser_rows = np.empty(len(lasers), LASER_RECORD)
+    if lasers:
+        shooters = np.repeat(shooter_ids, [len(group) for group in groups])
+        slots = np.array([laser.slot for laser in lasers])
+        order = np.argsort(slots, kind="stable")  # World order (each list keeps the same relative order)
+        rows = slots[order]
+        store = world.projectiles
+        for column in ("x", "y", "prev_x", "prev_y", "vel", "owner"):
+            laser_rows[column] = getattr(store, column)[rows]
+        images = [lasers[index].img for index in order.tolist()]
+        kinds = list(map(snapshot_codes.get, images))
+        if None in kinds:
+            kinds = [snapshot_code(image) for image in images]
+        kinds = np.array(kinds, np.int16)
+        laser_rows["sprite"] = kinds[:, 0]
+        laser_rows["angle"] = kinds[:, 1]
+        laser_rows["shooter"] = shooters[order]
+
+    power_up_rows = np.array([(p.x, p.y, p.prev_x, p.prev_y, SNAPSHOT_POWER_UPS.index(p.type)) for p in state.power_ups], POWER_UP_RECORD)
+    boss_kill_rows = np.array(state.boss_kills, BOSS_KILL_RECORD)
+
+    version, internal, gauss = state.rng.getstate()
+    numpy_state = world.rng.bit_generator.state
+    parts = [
+        SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION),
+        SNAPSHOT_GAME.pack(state.tick, state.score, state.level, state.lives, state.wave_length, state.enemy_vel,
+                           state.player_vel, state.boss_vel, state.lost_count, state.boss_warning_timer, state.boss_spawn_tick,
+                           state.lives_lost["escaped"], state.lives_lost["rammed"], state.lives_lost["boss"],
+                           state.lost, state.game_over, state.boss_spawned, state.boss_warning_displayed, boss is not None,
+                           SNAPSHOT_CAUSES.index(state.last_life_lost), SNAPSHOT_CAUSES.index(state.death_cause),
+                           len(enemy_rows), len(laser_rows), len(power_up_rows), len(boss_kill_rows)),
+        SNAPSHOT_PLAYER.pack(player.x, player.y, player.prev_x, player.prev_y, player.health, player.max_health,
+                             player.cool_down_counter, player.hit_timer, player.fuel, player.target_fuel,
+                             player.fuel_fill_speed, player.super_move_ready),
+        SNAPSHOT_BOSS.pack(boss.x, boss.y, boss.prev_x, boss.prev_y, boss.health, boss.max_health, boss.cool_down_counter,
+                           boss.hit_timer, boss.boss_cool_down_counter) if boss is not None else b"",
+        SNAPSHOT_RNG.pack(float("nan") if gauss is None else gauss,
+                          *divmod(numpy_state["state"]["state"], 1 << 64), *divmod(numpy_state["state"]["inc"], 1 << 64),
+                          numpy_state["has_uint32"], numpy_state["uinteger"]),
+        np.array(internal, np.uint32).tobytes(),  # Mersenne Twister words and position
+        enemy_rows.tobytes(), laser_rows.tobytes(), power_up_rows.tobytes(), boss_kill_rows.tobytes(),
+    ]
+    return b"".join(parts)
+
+
+# Function to rebuild a game from snapshot() bytes
+def restore(data):
+    """Return a new GameState equal to the snapshot. It replaces the running game: the previous GameState must not be used again.
+
+    A damaged snapshot raises ValueError before anything is touched, so the running game can carry on."""
+    try:
+        magic, version = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"not a version {SNAPSHOT_VERSION} Space Diddler save state")
+        offset = SNAPSHOT_HEADER.size
+        game = SNAPSHOT_GAME.unpack_from(data, offset)
+        offset += SNAPSHOT_GAME.size
+    except struct.error as error:
+        raise ValueError(f"truncated save state ({error})") from None
+    (tick, score, level, lives, wave_length, enemy_vel, player_vel, boss_vel, lost_count, boss_warning_timer, boss_spawn_tick,
+     escaped, rammed, boss_lives, lost, game_over, boss_spawned, boss_warning_displayed, has_boss, last_life_lost, death_cause,
+     enemy_count, laser_count, power_up_count, boss_kill_count) = game
+
+    # Read and check everything before building the game: GameState() clears the world the running game uses
+    expected = (offset + SNAPSHOT_PLAYER.size + (SNAPSHOT_BOSS.size if has_boss else 0) + SNAPSHOT_RNG.size + 625 * 4
+                + enemy_count * ENEMY_RECORD.itemsize + laser_count * LASER_RECORD.itemsize
+                + power_up_count * POWER_UP_RECORD.itemsize + boss_kill_count * BOSS_KILL_RECORD.itemsize)
+    if len(data) != expected:
+        raise ValueError(f"save state is {len(data)} bytes, expected {expected}")
+    player_fields = SNAPSHOT_PLAYER.unpack_from(data, offset)
+    offset += SNAPSHOT_PLAYER.size
+    boss_fields = None
+    if has_boss:
+        boss_fields = SNAPSHOT_BOSS.unpack_from(data, offset)
+        offset += SNAPSHOT_BOSS.size
+    gauss, state_high, state_low, inc_high, inc_low, has_uint32, uinteger = SNAPSHOT_RNG.unpack_from(data, offset)
+    offset += SNAPSHOT_RNG.size
+    internal = np.frombuffer(data, np.uint32, 625, offset)
+    offset += internal.nbytes
+
+    def rows(dtype, count):
+        nonlocal offset
+        array = np.frombuffer(data, dtype, count, offset)
+        offset += array.nbytes
+        return array
+
+    enemy_rows = rows(ENEMY_RECORD, enemy_count)
+    laser_rows = rows(LASER_RECORD, laser_count)
+    power_up_rows = rows(POWER_UP_RECORD, power_up_count)
+    boss_kill_rows = rows(BOSS_KILL_RECORD, boss_kill_count)
+    if (max(last_life_lost, death_cause) >= len(SNAPSHOT_CAUSES) or min(last_life_lost, death_cause) < 0
+            or np.any(enemy_rows["color"] >= len(SNAPSHOT_COLORS)) or np.any(laser_rows["sprite"] >= len(SNAPSHOT_SPRITES))
+            or np.any(power_up_rows["type"] >= len(SNAPSHOT_POWER_UPS)) or np.any(laser_rows["shooter"] >= enemy_count)
+            or np.any(laser_rows["shooter"] < (-2 if has_boss else -1))):
+        raise ValueError("save state refers to sprites or ships it doesn't have")
+    rng = random.Random()
+    rng.setstate((3, tuple(internal.tolist()), None if gauss != gauss else gauss))  # NaN stands for no spare (raises ValueError if damaged)
+
+    state = GameState()  # Clears the world, returning the previous game's entities to their pools
+    state.tick, state.score, state.level, state.lives = tick, score, level, lives
+    state.wave_length, state.enemy_vel, state.player_vel, state.boss_vel = wave_length, enemy_vel, player_vel, boss_vel
+    state.lost, state.lost_count, state.game_over = lost, lost_count, game_over
+    state.boss_spawned, state.boss_warning_displayed, state.boss_warning_timer = boss_spawned, boss_warning_displayed, boss_warning_timer
+    state.lives_lost = {"escaped": escaped, "rammed": rammed, "boss": boss_lives}
+    state.last_life_lost, state.death_cause = SNAPSHOT_CAUSES[last_life_lost], SNAPSHOT_CAUSES[death_cause]
+    state.boss_spawn_tick = boss_spawn_tick
+
+    player = state.player
+    (player.x, player.y, player.prev_x, player.prev_y, player.health, player.max_health, player.cool_down_counter,
+     player.hit_timer, player.fuel, player.target_fuel, player.fuel_fill_speed, player.super_move_ready) = player_fields
+
+    if boss_fields is not None:
+        x, y, prev_x, prev_y, health, max_health, cool_down, hit_timer, volley_cool_down = boss_fields
+        boss = state.boss = Boss(x, y, max_health)
+        boss.prev_x, boss.prev_y, boss.health = prev_x, prev_y, health
+        boss.cool_down_counter, boss.hit_timer, boss.boss_cool_down_counter = cool_down, hit_timer, volley_cool_down
+
+    state.rng = rng
+    world.rng.bit_generator.state = {"bit_generator": "PCG64",
+                                     "state": {"state": state_high << 64 | state_low, "inc": inc_high << 64 | inc_low},
+                                     "has_uint32": has_uint32, "uinteger": uinteger}
+
+    for row in enemy_rows.tolist():
+        x, y, prev_x, prev_y, vel, color, health, cool_down, hit_timer = row
+        enemy = ENEMY_POOL.acquire(x, y, SNAPSHOT_COLORS[color], vel)
+        enemy.prev_x, enemy.prev_y, enemy.health, enemy.cool_down_counter, enemy.hit_timer = prev_x, prev_y, health, cool_down, hit_timer
+        state.enemies.append(enemy)
+
+    for row in laser_rows.tolist():
+        x, y, prev_x, prev_y, vel, owner, sprite, angle, shooter = row
+        laser = LASER_POOL.acquire(x, y, ASSETS.image(SNAPSHOT_SPRITES[sprite]), angle, vel, owner)
+        laser.prev_x, laser.prev_y = prev_x, prev_y
+        ship = player if shooter == -1 else state.boss if shooter == -2 else state.enemies[shooter]
+        ship.lasers.append(laser)
+
+    for x, y, prev_x, prev_y, type_code in power_up_rows.tolist():
+        power_up = POWER_UP_POOL.acquire(x, y, SNAPSHOT_POWER_UPS[type_code])
+        power_up.prev_x, power_up.prev_y = prev_x, prev_y
+        state.power_ups.append(power_up)
+
+    state.boss_kills = [tuple(kill) for kill in boss_kill_rows.tolist()]
+    return state
+
+
+# Functions to keep a snapshot on disk
+def save_state(path, state):
+    data = snapshot(state)
+    with open(path, "wb") as state_file:
+        state_file.write(data)
+    return len(data)
+
+def load_state(path):
+    with open(path, "rb") as state_file:
+        return restore(state_file.read())
+
+
+STATE_PATH = "savestate.sds"  # Where F5 saves and F9 loads the game, set by --state-file
+LOAD_STATE_PATH = None  # Save state the first game starts from, set by --load-state
+
+# Rolling buffer of recent snapshots, for stepping a game back in time
+class RewindBuffer:
+    def __init__(self, seconds=30, interval=6, fps=60):
+        self.interval = interval  # Ticks between snapshots
+        self.snapshots = deque(maxlen=seconds * fps // interval)  # (tick, snapshot bytes), oldest first
+
+    def record(self, state):
+        """Snapshot the game if interval ticks have passed since the last snapshot."""
+        if state.tick % self.interval == 0 and (not self.snapshots or self.snapshots[-1][0] != state.tick):
+            self.snapshots.append((state.tick, snapshot(state)))
+
+    def rewind(self, ticks):
+        """Drop the snapshots newer than ticks ago and return the game restored from the newest one left (None if empty)."""
+        if not self.snapshots:
+            return None
+        target = self.snapshots[-1][0] - ticks
+        while len(self.snapshots) > 1 and self.snapshots[-1][0] > target:
+            self.snapshots.pop()
+        return restore(self.snapshots[-1][1])
+
+    def clear(self):
+        self.snapshots.clear()
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def nbytes(self):
+        return sum(len(data) for _, data in self.snapshots)
+
+
+# Leaderboard and session telemetry, kept in SQLite and written from a background thread
+class ScoreStore:
+    def __init__(self, path="scores.db", high_score_path="high_score.txt"):
+        self.path = path  # SQLite database file
+        self.high_score_path = high_score_path  # Best score as plain text, for anything that reads the old file
+        self.pending = queue.Queue()  # Sessions waiting to be written
+        self.thread = None  # Writer thread (started with the first session)
+        self.reader = None  # Connection for leaderboard queries on the main thread
+        self.written = 0  # Sessions written so far
+        self.batches = 0  # Transactions committed so far
+        self.errors = 0  # Batches the database couldn't take (their best score still goes to the high score file)
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")  # Readers don't wait for the writer, and commits are crash-safe
+        connection.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY, ended REAL, seed INTEGER, level INTEGER, score INTEGER, ticks INTEGER,
+            boss_kills INTEGER, death_cause TEXT, frame_ms_p50 REAL, frame_ms_p95 REAL, frame_ms_p99 REAL)""")
+        connection.execute("CREATE INDEX IF NOT EXISTS sessions_by_score ON sessions (score DESC)")  # Top-K reads only K rows
+        return connection
+
+    def record(self, session):
+        """Queue a finished session (a dict of the sessions columns); never touches the disk itself."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._write_loop, name="ScoreStore", daemon=True)
+            self.thread.start()
+        self.pending.put(session)
+
+    def _write_loop(self):
+        connection = None
+        try:
+            connection = self.connect()
+        except sqlite3.Error as error:  # Keep taking sessions so flush() returns; the high score file still gets the best
+            print(f"Score store: can't open {self.path}: {error}")
+        while True:
+            batch = [self.pending.get()]
+            while not self.pending.empty():  # Write everything queued so far in one transaction
+                batch.append(self.pending.get())
+            stop = None in batch
+            sessions = [session for session in batch if session is not None]
+            try:
+                if sessions:
+                    best = max(session["score"] for session in sessions)
+                    if connection is not None:
+                        try:
+                            with connection:  # One atomic transaction per batch
+                                connection.executemany(
+                                    "INSERT INTO sessions (ended, seed, level, score, ticks, boss_kills, death_cause, frame_ms_p50, frame_ms_p95, frame_ms_p99) "
+                                    "VALUES (:ended, :seed, :level, :score, :ticks, :boss_kills, :death_cause, :frame_ms_p50, :frame_ms_p95, :frame_ms_p99)",
+                                    sessions)
+                            self.written += len(sessions)
+                            self.batches += 1
+                            best = connection.execute("SELECT MAX(score) FROM sessions").fetchone()[0]  # Uses the score index
+                        except sqlite3.Error as error:
+                            self.errors += 1
+                            print(f"Score store: can't write to {self.path}: {error}")
+                    else:
+                        self.errors += 1
+                    self._write_high_score(best)
+            except OSError as error:
+                print(f"Score store: can't write {self.high_score_path}: {error}")
+            finally:
+                for _ in batch:
+                    self.pending.task_done()  # Always, or flush() would wait forever
+            if stop:
+                if connection is not None:
+                    connection.close()
+                return
+
+    def _write_high_score(self, best):
+        if best is None or best <= self.read_high_score_file():
+            return
+        temporary = self.high_score_path + ".tmp"
+        with open(temporary, "w") as high_score_file:
+            high_score_file.write(str(best))
+            high_score_file.flush()
+            os.fsync(high_score_file.fileno())
+        os.replace(temporary, self.high_score_path)  # Atomic: readers see the old or the new file, never half of one
+
+    def read_high_score_file(self):
+        try:
+            with open(self.high_score_path) as high_score_file:
+                return int(high_score_file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def flush(self):
+        """Wait until every queued session is written (for scene transitions and shutdown)."""
+        if self.thread is not None:
+            self.pending.join()
+
+    def top(self, k=10):
+        """Return the best k sessions as (score, level, ended) rows, best first (just the high score file's, if the database can't be read)."""
+        try:
+            if self.reader is None:
+                self.reader = self.connect()
+            return self.reader.execute("SELECT score, level, ended FROM sessions ORDER BY score DESC LIMIT ?", (k,)).fetchall()
+        except sqlite3.Error:
+            best = self.read_high_score_file()
+            return [(best, None, None)] if best and k > 0 else []
+
+    def high_score(self):
+        """Best score ever, including the one in the high score file."""
+        best = self.top(1)
+        return max(best[0][0] if best else 0, self.read_high_score_file())
+
+    def close(self):
+        if self.thread is not None:
+            self.pending.put(None)  # Stop after writing what is queued
+            self.thread.join()
+            self.thread = None
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+SCORES = ScoreStore()  # Scores of the games played in the window (headless games aren't recorded)
+
+# Fixed timestep: the game logic runs at a steady rate however fast or slow frames are drawn
+class FixedTimestep:
+    def __init__(self, rate=60, max_steps=5):
+        self.step = 1.0 / rate  # Seconds of game time per tick
+        self.max_steps = max_steps  # Most ticks to catch up in one frame (so a long stall doesn't freeze the game)
+        self.accumulator = 0.0  # Real time not yet simulated
+
+    def advance(self, frame_seconds):
+        """Add a frame's real time and return how many ticks to simulate."""
+        self.accumulator += frame_seconds
+        steps = int(self.accumulator / self.step)
+        if steps > self.max_steps:  # Too far behind: drop the backlog instead of spiralling
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step
+        return steps
+
+    @property
+    def alpha(self):
+        """How far the drawn frame is between the last tick and the next one (0 to 1)."""
+        return min(self.accumulator / self.step, 1.0)
+
+
+# Function to find the display's refresh rate, so drawing isn't capped at the tick rate
+def display_refresh_rate(default=60):
+    get_rate = getattr(pygame.display, "get_current_refresh_rate", None)  # Not available in every pygame version
+    rate = get_rate() if get_rate is not None else 0
+    return rate or default
+
+
+RENDER_FPS = display_refresh_rate()  # Frames drawn per second (0 draws as fast as possible)
+FRAME_TIME_HISTORY = 60 * 60 * 10  # Frame times kept for a game's summary (ten minutes at 60 fps)
+
+
+# Game state: everything one game needs, advanced one tick at a time by step()
+class GameState:
+    """The state of one game. step() runs the game logic for one tick without touching the display."""
+
+    FPS = 60  # Ticks per second of game time
+
+    # Difficulty (tuned with batch_runner.py)
+    WAVE_GROWTH = 5  # Extra enemies in each wave
+    POWER_UP_CHANCE = 0.5  # Chance of a power-up with each wave
+    BOSS_BASE_HEALTH = 30000  # Boss health before the per-boss increase
+    BOSS_HEALTH_STEP = 5000  # Extra health for every fifth level
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)  # Random numbers for spawning and boss movement
+        world.clear()  # Start with no lasers or enemies left over from a previous game
+        world.rng = np.random.default_rng(seed)  # Random numbers for the vectorized fire rolls
+
+        self.tick = 0  # Ticks simulated so far
+        self.level = 0  # Initial game level
+        self.lives = 10  # Initial number of lives
+        self.score = 0  # Initialize score to 0
+
+        self.enemies = []  # List to hold enemy ships
+        self.wave_length = 5  # Initial wave length (number of enemies)
+        self.enemy_vel = 1  # Initial enemy movement speed
+
+        self.player_vel = 10  # Player movement speed
+        self.boss_vel = 2  # Boss movement speed
+
+        self.player = Player(300, 630)  # Initialize player ship at (300, 630)
+
+        self.lost = False  # Boolean to track if the player has lost
+        self.lost_count = 0  # Counter for how long the lost message is shown
+        self.game_over = False  # True once the game over screen should be shown
+
+        self.boss_spawned = False  # Track if the boss has been spawned
+        self.boss = None  # Boss object (None if no boss is present)
+        self.boss_warning_displayed = False  # Track if the boss warning is being displayed
+        self.boss_warning_timer = 0  # Timer for how long the boss warning is shown
+
+        # Outcome statistics
+        self.lives_lost = {"escaped": 0, "rammed": 0, "boss": 0}  # Lives lost by cause
+        self.last_life_lost = None  # Cause of the most recent lost life
+        self.death_cause = None  # What ended the game: a life-loss cause, or "shot" when health ran out
+        self.boss_spawn_tick = 0  # Tick the current boss appeared
+        self.boss_kills = []  # (level, ticks to kill) for every boss defeated
+
+        self.power_ups = world.power_ups  # List to hold power-ups (owned by the world, which returns them to their pool)
+        self.collision_grid = SpatialHash()  # Broad phase for ram and pickup checks against the player
+
+    def damage_player(self, cause="rammed"):
+        """Apply a ram hit to the player, costing a life when health runs out."""
+        player = self.player
+        player.take_hit()  # Apply hit to player
+        player.health -= 10  # Decrease player's health
+        if player.health <= 0:  # If player's health is depleted
+            self.lose_life(cause)
+            player.health = player.max_health  # Restore player's health
+
+    def lose_life(self, cause):
+        self.lives -= 1  # Decrease player's lives
+        self.lives_lost[cause] += 1
+        self.last_life_lost = cause
+
+    def spawn_wave(self):
+        """Start the next level: a new wave of enemies, maybe a power-up, and a boss every 5 levels."""
+        rng = self.rng
+        self.level += 1  # Increment the level
+        self.wave_length += self.WAVE_GROWTH  # Increase the wave length (number of enemies)
+        self.enemy_vel += 0 * (self.level // 2)  # Increase enemy speed every 2 levels
+        for i in range(self.wave_length):  # Spawn new enemies for the new wave
+            enemy = ENEMY_POOL.acquire(rng.randrange(50, WIDTH - 100), rng.randrange(-1500, -100), rng.choice(["red", "blue", "green", "black"]), self.enemy_vel)  # Random enemy color
+            self.enemies.append(enemy)  # Add the enemy to the list
+
+        # Spawn a power-up randomly with a 30% chance
+        if rng.random() < self.POWER_UP_CHANCE:
+            self.power_ups.append(spawn_power_up(rng))  # Add a power-up to the list
+
+        # Spawn a boss if it's a boss level
+        if not self.boss_spawned and self.level % 5 == 0:  # Show warning before boss spawn
+            self.boss_warning_displayed = True  # Show the boss warning
+            self.boss_warning_timer = self.FPS * 3  # Display warning for 3 seconds
+            self.boss_spawned = True  # Indicate that a boss has spawned
+            self.boss = spawn_boss(self.level, self.BOSS_BASE_HEALTH, self.BOSS_HEALTH_STEP)  # Spawn the boss
+            self.boss_spawn_tick = self.tick
+
+    def step(self, inputs):
+        """Advance the game by one tick using the given Inputs."""
+        self.tick += 1
+        player = self.player
+        self.save_positions()  # Where everything was before this tick, for drawing between ticks
+
+        if self.lives <= 0 or player.health <= 0:  # If the player runs out of lives or health
+            if not self.lost:
+                self.death_cause = "shot" if player.health <= 0 else self.last_life_lost  # What finally ended the game
+            self.lost = True  # Set lost to True
+            self.lost_count += 1  # Increment lost count
+
+        if self.lost and self.lost_count > self.FPS * 3:  # After 3 seconds, show the game over screen
+            self.game_over = True
+
+        if len(self.enemies) == 0 and not self.boss_spawned:  # If no enemies are left and no boss is present
+            with PROFILER.phase("spawn"):
+                self.spawn_wave()
+
+        handle_movement(inputs, player, self.player_vel)  # Handle player movement
+
+        if inputs.shoot:  # If space bar is pressed, shoot lasers
             player.shoot()
 
-        if keys[pygame.K_k] and player.super_move_ready:  # If "K" is pressed and super move is ready, shoot super laser
+        if inputs.super and player.super_move_ready:  # If "K" is pressed and super move is ready, shoot super laser
             player.shoot_super_laser()
 
-        if boss_spawned and boss_warning_displayed:  # If boss has spawned and warning is being displayed
-            boss_warning_timer -= 1  # Decrease the warning timer
-            if boss_warning_timer <= 0:  # If warning timer runs out
-                boss_warning_displayed = False  # Stop displaying the boss warning
-
-        # Handle enemy movement and shooting
-        for enemy in enemies[:]:
-            enemy.move(enemy_vel)  # Move the enemy
-            enemy.move_lasers(laser_vel, player)  # Move enemy lasers and check for collision with player
-
-            if random.randrange(0, 2 * 60) == 1:  # Random chance to shoot lasers
-                enemy.shoot()
-
+        if self.boss_spawned and self.boss_warning_displayed:  # If boss has spawned and warning is being displayed
+            self.boss_warning_timer -= 1  # Decrease the warning timer
+            if self.boss_warning_timer <= 0:  # If warning timer runs out
+                self.boss_warning_displayed = False  # Stop displaying the boss warning
+
+        with PROFILER.phase("enemies"):
+            self.update_enemies()
+        if self.boss_spawned:
+            with PROFILER.phase("boss"):
+                self.update_boss()
+        with PROFILER.phase("player_lasers"):
+            self.update_player_lasers()
+        with PROFILER.phase("power_ups"):
+            self.update_power_ups()
+
+    def save_positions(self):
+        """Remember every position as the previous one and count down the hit indicators."""
+        world.save_positions()  # Every pooled laser and enemy in one array copy
+        unstored = [self.player, *self.power_ups] + ([self.boss] if self.boss_spawned else [])  # Positions kept on the objects
+        for obj in unstored:
+            obj.save_position()
+        for ship in [self.player, *self.enemies] + ([self.boss] if self.boss_spawned else []):
+            ship.update_hit_timer()
+
+    def update_enemies(self):
+        """Move the world, then handle enemy lasers, shooting, ramming and escapes."""
+        player = self.player
+
+        # Move every laser and enemy at once and cull the lasers that left the screen
+        world.move(HEIGHT)
+
+        # Handle enemy lasers and shooting
+        for enemy in self.enemies:
+            enemy.move_lasers(player)  # Check enemy lasers for collision with player
+
+        for enemy in world.enemies.roll(world.rng, 2 * 60):  # Random chance to shoot lasers, rolled for every enemy at once
+            enemy.shoot()
+
+        # Check for enemies ramming the player, testing only the enemies near the player
+        self.collision_grid.build(self.enemies)
+        for enemy in self.collision_grid.query(bounding_rect(player)):
             if collide(enemy, player):  # Check for collision between enemy and player
-                player.take_hit()  # Apply hit to player
-                player.health -= 10  # Decrease player's health
-                if player.health <= 0:  # If player's health is depleted
-                    lives -= 1  # Decrease player's lives
-                    player.health = player.max_health  # Restore player's health
-                enemies.remove(enemy)  # Remove the enemy
-            elif enemy.y + enemy.get_height() > HEIGHT:  # If the enemy moves off screen
-                lives -= 1  # Decrease player's lives
-                enemies.remove(enemy)  # Remove the enemy
-
-        # Handle boss movement, shooting, and collision with player
-        if boss_spawned:
-            boss.move(boss_vel)  # Move the boss
-            boss.boss_cooldown()  # Handle boss shooting cooldown
-            boss.boss_shoot()  # Boss shoots lasers
-            boss.move_lasers(laser_vel, player)  # Move boss lasers and check for collision with player
-
-            if collide(boss, player):  # Check for collision between boss and player
-                player.take_hit()  # Apply hit to player
-                player.health -= 10  # Decrease player's health
-                if player.health <= 0:  # If player's health is depleted
-                    lives -= 1  # Decrease player's lives
-                    player.health = player.max_health  # Restore player's health
-
-            if boss.health > 0:  # If boss is still alive
-                player.move_lasers(-laser_vel, [boss])  # Move player lasers and check for collision with boss
-                for laser in player.lasers[:]:
-                    if collide(laser, boss):  # Check for collision between player's laser and boss
-                        boss.take_hit()  # Apply hit to boss
-                        boss.health -= 500  # Decrease boss's health
-                        LASER_HIT_SOUND.play()  # Play hit sound
-                        player.lasers.remove(laser)  # Remove the laser
-
-            if boss.health <= 0:  # If boss's health is depleted
-                boss_spawned = False  # Boss is defeated
-                boss = None  # Remove the boss object
-
-        # Handle player lasers and collision with enemies
-        player.move_lasers(-laser_vel, enemies)  # Move player lasers and check for collision with enemies
+                self.damage_player()
+                enemy.destroy()  # Remove the enemy
+
+        for enemy in world.enemies.below(HEIGHT):  # Enemies that moved off the bottom of the screen
+            self.lose_life("escaped")
+            enemy.destroy()  # Remove the enemy
+
+    def update_boss(self):
+        """Handle boss movement, shooting, and collision with the player."""
+        player = self.player
+        boss = self.boss
+        boss.move(self.boss_vel, self.rng)  # Move the boss
+        boss.boss_cooldown()  # Handle boss shooting cooldown
+        boss.boss_shoot()  # Boss shoots lasers
+        boss.move_lasers(player)  # Check boss lasers for collision with player
+
+        if collide(boss, player):  # Check for collision between boss and player
+            self.damage_player("boss")
+
+        if boss.health > 0:  # If boss is still alive
+            self.score += 100 * player.move_lasers([boss])  # Check player lasers for collision with boss (a kill scores like an enemy)
+            for laser in player.lasers:
+                if laser.alive and collide(laser, boss):  # Check for collision between player's laser and boss
+                    boss.take_hit()  # Apply hit to boss
+                    boss.health -= 500  # Decrease boss's health
+                    SOUNDS.play("laser_hit")  # Play hit sound
+                    laser.alive = False  # Remove the laser
+
+        if boss.health <= 0:  # If boss's health is depleted
+            self.boss_kills.append((self.level, self.tick - self.boss_spawn_tick))  # Level and ticks taken to kill it
+            boss.destroy()  # Remove the boss's lasers
+            self.boss_spawned = False  # Boss is defeated
+            self.boss = None  # Remove the boss object
+
+    def update_player_lasers(self):
+        """Handle player lasers and collision with enemies."""
+        player = self.player
+        kills = player.move_lasers(self.enemies)  # Check player lasers for collision with enemies and drop destroyed enemies
+        self.score += 100 * kills  # Add points to the score for every enemy killed
         player.update_fuel()  # Update the fuel bar animation
+        world.compact()  # Remove this tick's dead lasers and enemies from the arrays
 
-        # Handle power-ups
-        for power_up in power_ups[:]:
+    def update_power_ups(self):
+        """Move power-ups and apply the ones the player touches."""
+        player = self.player
+        for power_up in self.power_ups:
             power_up.move(2)  # Move the power-up downwards
+
+        self.collision_grid.build(self.power_ups)  # Only test the power-ups near the player
+        for power_up in self.collision_grid.query(bounding_rect(player)):
             if collide(power_up, player):  # Check for collision with player
                 player.collect_power_up(power_up)  # Apply the power-up effect to the player
-                power_ups.remove(power_up)  # Remove the power-up
-            elif power_up.y > HEIGHT:  # If the power-up moves off screen
-                power_ups.remove(power_up)  # Remove the power-up
+                self.power_ups.remove(power_up)  # Remove the power-up
+                POWER_UP_POOL.release(power_up)
+
+        for power_up in self.power_ups[:]:
+            if power_up.y > HEIGHT:  # If the power-up moves off screen
+                self.power_ups.remove(power_up)  # Remove the power-up
+                POWER_UP_POOL.release(power_up)
+
+    def entity_counts(self):
+        """Return how many enemies, lasers per owner and power-ups are alive."""
+        store = world.projectiles
+        owners = store.owner[:store.count][store.alive[:store.count]]
+        player_lasers, enemy_lasers, boss_lasers = np.bincount(owners, minlength=3)[:3]  # Lasers per owner in one pass
+        return {"enemies": len(self.enemies), "player_lasers": int(player_lasers), "enemy_lasers": int(enemy_lasers),
+                "boss_lasers": int(boss_lasers), "power_ups": len(self.power_ups)}
+
+# Simple bot that flies under the lowest enemy and keeps shooting
+def autopilot(state):
+    """Return Inputs that chase the enemy closest to the bottom of the screen while firing."""
+    player = state.player
+    targets = [enemy for enemy in state.enemies if enemy.y > -70] or ([state.boss] if state.boss else [])
+    if not targets:
+        return NO_INPUTS._replace(shoot=True)
+    target = max(targets, key=lambda enemy: enemy.y)  # Most dangerous enemy
+    center = player.x + player.get_width() / 2
+    target_center = target.x + target.get_width() / 2
+    return NO_INPUTS._replace(left=center > target_center + 10, right=center < target_center - 10,
+                              shoot=True, super=player.super_move_ready)
+
+# Function to play a whole game without a display
+def run_headless(seed=None, max_ticks=None, policy=autopilot, recorder=None, state=None):
+    """Simulate a game as fast as possible (from state, if given) and return its final state."""
+    if state is None:
+        state = GameState(seed)
+    while not state.game_over and (max_ticks is None or state.tick < max_ticks):
+        inputs = policy(state)
+        if recorder is not None:
+            recorder.record(inputs)
+        state.step(inputs)
+    SOUNDS.clear()  # Nothing flushes the sounds of a headless game
+    if recorder is not None:
+        recorder.close(state)
+    return state
+
+# Function to draw one frame of the game (on a static background when video_frame is None)
+def draw_game(window, state, video_frame, alpha=1.0, dirty=None):
+    renderer = RENDERER
+    renderer.begin()
+    if dirty is not None:  # Dirty-rect mode: restore the background only where the last frame drew
+        for command in dirty.erase_commands():
+            renderer.add("background", *command)
+    else:
+        renderer.add("background", video_frame if video_frame is not None else static_background(), (0, 0))  # The video frame
+
+    with PROFILER.phase("sprites"):
+        tint = GOVERNOR.settings.hit_tint  # Whether hit ships are drawn tinted red
+
+        def ship_image(ship):
+            if tint and ship.hit_timer > 0:  # Hit ships are drawn red-tinted (from the cache)
+                with PROFILER.phase("tint"):
+                    return TINT_CACHE.get(ship.ship_img, HIT_TINT)
+            return ship.ship_img
+
+        renderer.add_store("projectiles", world.projectiles, alpha, lambda laser: laser.img)  # Every laser, whoever fired it
+        renderer.add_store("ships", world.enemies, alpha, ship_image)  # Enemies waiting above the screen are culled here
+
+        player = state.player
+        position = renderer.add_sprite("ships", player, ship_image(player), alpha)
+        if position is not None:  # Health and fuel bars under the player ship
+            x, y = position
+            width, height = player.get_width(), player.get_height()
+            renderer.add_bar("ships", x, y + height + 10, width, player.health / player.max_health, (0, 255, 0))
+            renderer.add_bar("ships", x, y + height + 20, width, player.fuel / player.max_fuel, (0, 0, 255))
+
+        if state.boss_spawned:  # If a boss is present
+            boss = state.boss
+            position = renderer.add_sprite("ships", boss, ship_image(boss), alpha)
+            if position is not None:  # Health bar under the boss
+                x, y = position
+                renderer.add_bar("ships", x, y + boss.get_height() + 10, boss.get_width(), boss.health / boss.max_health, (0, 255, 0))
+
+        for power_up in state.power_ups:  # Power-ups fall in from above the screen
+            renderer.add_sprite("pickups", power_up, power_up.img, alpha)
+
+    with PROFILER.phase("hud"):
+        # Render the game status labels (only when their values change)
+        lives_label = TEXT_CACHE.label("lives", "system", 50, f"Health: {state.lives}", (255, 255, 255))  # Health label
+        level_label = TEXT_CACHE.label("level", "system", 50, f"Level: {state.level}", (255, 255, 255))  # Level label
+        score_label = TEXT_CACHE.label("score", "system", 50, f"Score: {state.score}", (255, 255, 255))  # Score label
+
+        renderer.add("hud", lives_label, (10, 10))  # Top left corner for lives
+        renderer.add("hud", level_label, (WIDTH - level_label.get_width() - 10, 10))  # Top right corner for level
+        renderer.add("hud", score_label, (WIDTH // 2 - score_label.get_width() // 2, 10))  # Center for score
+
+        if state.boss_warning_displayed:  # If the boss warning is being displayed
+            warning_label = TEXT_CACHE.label("boss_warning", "system", 80, "Boss Incoming!", (255, 0, 0))  # Render the boss warning text
+            renderer.add("hud", warning_label, (WIDTH // 2 - warning_label.get_width() // 2, HEIGHT // 2))  # Center the warning text
+
+        if state.lost:  # If the player has lost
+            lost_label = TEXT_CACHE.label("lost", "system", 60, "You Lost!!", (255, 255, 255))  # Render "You Lost" message
+            renderer.add("hud", lost_label, (WIDTH / 2 - lost_label.get_width() / 2, 350))  # Center the lost message
+
+    with PROFILER.phase("blits"):
+        renderer.submit(window, dirty)  # One blits call per layer
+
+# Scene: one game. Returns the next scene ("game_over" or "quit").
+def main():
+    global recorded_games, LOAD_STATE_PATH
+    next_scene = None  # Set when the game ends or the window is closed
+    seed = None  # Unseeded unless the game is replayed or recorded
+    if REPLAY_PLAY is not None:
+        seed = REPLAY_PLAY.seed
+    elif REPLAY_RECORD_PATH is not None:
+        seed = random.randrange(2 ** 32)  # A replay needs to know the seed
+    if LOAD_STATE_PATH is not None and REPLAY_PLAY is None and REPLAY_RECORD_PATH is None:
+        state = load_state(LOAD_STATE_PATH)  # Start from the middle of a saved game
+        LOAD_STATE_PATH = None  # Later games start from the beginning
+    else:
+        state = GameState(seed)  # Fresh game (clears whatever the previous game left in the world)
+    rewind_buffer = None  # Recent snapshots (not while a replay is recorded or played: it would stop matching)
+    if REPLAY_PLAY is None and REPLAY_RECORD_PATH is None:
+        rewind_buffer = RewindBuffer()
+    recorder = None
+    if REPLAY_RECORD_PATH is not None:
+        recorded_games += 1
+        recorder = ReplayRecorder(replay_record_path(recorded_games), seed)
+    timestep = FixedTimestep(state.FPS)  # Game logic runs at 60 ticks per second
 
-    game_cap.release()  # Release the game background video capture object
+    clock = pygame.time.Clock()  # Create a clock to control frame rate
+    frame_times = deque(maxlen=FRAME_TIME_HISTORY)  # Milliseconds between recent frames, for the session's summary
+    first_frame = True  # The first frame includes loading, so it isn't counted
+
+    # Play game background music in a loop
+    pygame.mixer.music.load(GAME_MUSIC)  # Load the game background music
+    pygame.mixer.music.play(-1)  # Play the music indefinitely
+
+    dirty = None  # Dirty-rect tracking, when the background is static
+    if game_decoder is None:  # No video: only redraw and update the parts of the screen that change
+        dirty = DirtyRects(static_background())
+    else:
+        game_decoder.rewind()  # Every game starts the background video from the beginning
+        GOVERNOR.apply(game_decoder)  # Keep the quality the last game ended on
+        game_decoder.start()  # Make sure the game background video is decoding
+
+    INPUT.clear()
+    frame_rate = SCHEDULER.frame_rate("playing")
+    paused = False  # Whether the game is paused because the window is in the background
+    while next_scene is None:  # Main game loop
+        with PROFILER.phase("tick"):
+            frame_seconds = clock.tick(frame_rate) / 1000  # Time since the last frame
+
+        with PROFILER.phase("events"):
+            # Event handling loop, right before the simulation so key presses reach this frame's ticks
+            for event in INPUT.pump(SCHEDULER.idle_timeout(animating=True)):
+                if event.type == pygame.QUIT:  # If the user closes the window
+                    next_scene = "quit"  # Exit the game loop
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:  # F3 shows or hides the profiler overlay
+                    PROFILER.toggle_overlay()
+                if event.type == pygame.KEYDOWN and event.key in (pygame.K_F5, pygame.K_F9, pygame.K_BACKSPACE):
+                    if rewind_buffer is None:
+                        print("Save states are off while a replay is recorded or played")
+                    elif event.key == pygame.K_F5:  # F5 saves the game
+                        print(f"Saved tick {state.tick} to {STATE_PATH} ({save_state(STATE_PATH, state)} bytes)")
+                    elif event.key == pygame.K_F9:  # F9 loads the saved game
+                        try:
+                            state = load_state(STATE_PATH)
+                            rewind_buffer.clear()  # Its snapshots belong to another timeline
+                            print(f"Loaded tick {state.tick} from {STATE_PATH}")
+                        except (OSError, ValueError) as error:
+                            print(f"Could not load {STATE_PATH}: {error}")
+                    elif len(rewind_buffer):  # Backspace goes back five seconds
+                        state = rewind_buffer.rewind(5 * state.FPS)
+
+        if not SCHEDULER.active():  # Window unfocused or minimized: pause the game, its music and its video
+            if not paused:
+                paused = True
+                pygame.mixer.music.pause()
+            PROFILER.end_frame("paused")
+            continue
+        if paused:  # Back in the foreground
+            paused = False
+            pygame.mixer.music.unpause()
+            frame_seconds = 0  # Don't catch up on the time spent paused
+        steps = timestep.advance(frame_seconds)  # Ticks owed for the time since the last frame
+        if not first_frame:
+            frame_times.append(clock.get_time())  # For the session's frame-time summary
+        first_frame = False
+
+        with PROFILER.phase("update"):
+            for _ in range(steps):
+                tick_inputs = INPUT.tick_inputs() if REPLAY_PLAY is None else REPLAY_PLAY.policy(state)  # Keyboard or recording
+                if recorder is not None:
+                    recorder.record(tick_inputs)
+                state.step(tick_inputs)  # Run the game logic for each tick owed
+                if rewind_buffer is not None:
+                    rewind_buffer.record(state)
+                if state.game_over:
+                    break
+            if REPLAY_PLAY is not None:
+                INPUT.clear()  # The recording plays the game: key presses read meanwhile are never simulated
+            SOUNDS.flush()  # Play this frame's sound effects, once each
+        video_frame = None
+        if game_decoder is not None and not GOVERNOR.settings.static_background:
+            with PROFILER.phase("video"):
+                video_frame = game_decoder.next_frame(steps)  # The video advances one frame per tick
+        with PROFILER.phase("draw"):
+            draw_game(WIN, state, video_frame, timestep.alpha, dirty)  # Redraw the window, between the last two ticks
+        overlay = PROFILER.draw_overlay(WIN)
+        with PROFILER.phase("display"):
+            if dirty is None:
+                pygame.display.update()  # Update the display with the new frame
+            else:
+                dirty.add(overlay)
+                dirty.update()  # Update only the parts that changed
+            INPUT.displayed()  # The key presses simulated this frame are on screen now
+        if PROFILER.enabled:
+            PROFILER.end_frame("game", state.entity_counts() | RENDERER.counts())
+        if GOVERNOR.update(clock.get_rawtime()):  # Work time of the last frame, without the frame-rate wait
+            GOVERNOR.apply(game_decoder)
+
+        if state.game_over and next_scene is None:  # After the "You Lost" message, show the game over screen
+            next_scene = "game_over"
+
+    pygame.mixer.music.stop()  # The game music restarts with the next game
+    if recorder is not None:
+        recorder.close(state)
+    if state.tick > 0:  # Queue the session for the score store (written on its own thread)
+        frame_ms = np.percentile(frame_times or [0], [50, 95, 99])
+        SCORES.record({"ended": time.time(), "seed": seed, "level": state.level, "score": state.score, "ticks": state.tick,
+                       "boss_kills": len(state.boss_kills), "death_cause": state.death_cause,
+                       "frame_ms_p50": float(frame_ms[0]), "frame_ms_p95": float(frame_ms[1]), "frame_ms_p99": float(frame_ms[2])})
+    world.clear()  # Let go of this game's enemies and lasers now rather than at the next game
+    return next_scene
+
+
+# Every scene by name; each runs until it returns the name of the next one
+SCENES = {
+    "menu": main_menu,
+    "playing": main,
+    "game_over": game_over_screen,
+}
+
+# Function to run the scenes one after another until one returns "quit"
+def run_scenes(scene="menu"):
+    """Run scenes from one loop, so restarting a game never grows the call stack."""
+    while scene != "quit":
+        SCHEDULER.enter(scene)  # CPU time is charged to the running scene
+        scene = SCENES[scene]()
+        SOUNDS.clear()  # Hits from the last frame of a scene don't play in the next one
+    SCHEDULER.leave()
+
+    if game_decoder is not None:
+        game_decoder.stop()  # Stop decoding and release the game background video capture object
+    SCORES.close()  # Write any sessions still queued
+    print(pool_report())
+    print(RENDERER.report())
+    print(INPUT.report())
+    print(SCHEDULER.report())
+    stats = SOUNDS.stats()
+    print(f"Sounds: {stats['played']} played, {stats['merged']} merged, {stats['dropped']} dropped, {stats['stolen']} stolen")
+    PROFILER.close()  # Finish the profile file, if one is being written
     pygame.quit()  # Quit pygame
 
 # Run the game by calling the main menu and main game functions
 if __name__ == "__main__":
-    main_menu()  # Display the main menu
-    main()  # Start the main game
+    parser = argparse.ArgumentParser(description="Space Diddler")
+    parser.add_argument("--asset-timing", action="store_true", help="print asset load and spawn timings and exit")
+    parser.add_argument("--headless", action="store_true", help="simulate games with the autopilot, without a window")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for headless games")
+    parser.add_argument("--games", type=int, default=1, help="number of headless games to simulate")
+    parser.add_argument("--max-ticks", type=int, default=None, help="stop each headless game after this many ticks")
+    parser.add_argument("--record", help="record each game's seed and inputs to this replay file")
+    parser.add_argument("--replay", help="play back a recorded replay (as fast as possible with --headless)")
+    parser.add_argument("--load-state", help="start the first game from a save state (see F5)")
+    parser.add_argument("--state-file", default=STATE_PATH, help="save state file written by F5 and read by F9")
+    parser.add_argument("--prewarm", action="store_true", help="build the hit tints and laser sprites before the menu instead of on first use")
+    parser.add_argument("--no-video", action="store_true", help="draw a static background instead of the videos")
+    parser.add_argument("--quality", default="auto",
+                        help="'auto' adjusts quality to hold the frame rate; 0-4 fixes a stage (0 full, 4 cheapest)")
+    parser.add_argument("--render-fps", type=int, default=None, help="frames drawn per second (default: the display refresh rate, 0 for uncapped)")
+    parser.add_argument("--profile", action="store_true", help="start with the profiler overlay shown (toggle with F3)")
+    parser.add_argument("--profile-out", help="write per-frame profile samples to a .csv file or a .json Chrome trace")
+    args = parser.parse_args()
+
+    if args.render_fps is not None:
+        RENDER_FPS = args.render_fps
+    GOVERNOR.target_ms = 1000 / (RENDER_FPS or 60)  # Uncapped: aim for at least 60 fps
+    if args.quality != "auto":
+        GOVERNOR.auto = False
+        GOVERNOR.set_stage(int(args.quality))
+    if args.profile:
+        PROFILER.toggle_overlay()
+    if args.profile_out:
+        PROFILER.open_output(args.profile_out)
+
+    REPLAY_RECORD_PATH = args.record
+    STATE_PATH = args.state_file
+    LOAD_STATE_PATH = args.load_state
+    if args.replay:
+        REPLAY_PLAY = Replay(args.replay)
+
+    if args.headless and REPLAY_PLAY is not None:  # Play the replay back and check it ends like the recording
+        start = time.perf_counter()
+        recorder = ReplayRecorder(args.record, REPLAY_PLAY.seed) if args.record else None
+        state = run_headless(REPLAY_PLAY.seed, len(REPLAY_PLAY), REPLAY_PLAY.policy, recorder)
+        elapsed = time.perf_counter() - start
+        matches = REPLAY_PLAY.check(state)
+        print(f"Replay: level {state.level}, score {state.score}, {state.tick} ticks in {elapsed:.2f} s "
+              f"({state.tick / elapsed:.0f} ticks/s)" + {None: "", True: ", matches the recording", False: ", DIFFERS from the recording"}[matches])
+        raise SystemExit(1 if matches is False else 0)
+
+    if args.headless:  # Simulate games as fast as possible and print how they went
+        for game in range(args.games):
+            seed = None if args.seed is None else args.seed + game
+            loaded = load_state(args.load_state) if args.load_state and game == 0 else None  # Only the first game starts from it
+            recorder = None
+            if args.record and loaded is None:  # A replay starts at tick 0
+                seed = random.randrange(2 ** 32) if seed is None else seed  # A replay needs to know the seed
+                recorder = ReplayRecorder(replay_record_path(game + 1), seed)
+            start = time.perf_counter()
+            state = run_headless(seed, args.max_ticks, recorder=recorder, state=loaded)
+            elapsed = time.perf_counter() - start
+            print(f"Game {game + 1}: level {state.level}, score {state.score}, {state.tick} ticks "
+                  f"in {elapsed:.2f} s ({state.tick / elapsed:.0f} ticks/s)")
+        print(pool_report())
+        raise SystemExit
+
+    if args.asset_timing:  # Report asset costs instead of playing
+        measure_asset_timing()
+        raise SystemExit
+
+    if args.prewarm:  # Otherwise sprites load in the background while the menu plays, and tints and lasers on first use
+        prewarm_tint_cache()  # Build the hit tints before the first frame needs them
+        prewarm_projectile_templates()  # Build the laser sprites and masks before the first shot
+    run_scenes("menu" if REPLAY_PLAY is None else "playing")  # Main menu, then games and game over screens until the player quits
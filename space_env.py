@@ -0,0 +1,293 @@
+# Gym-style environment for training and evaluating agents on Space Diddler
+#
+# SpaceEnv wraps one game with reset()/step() in the Gymnasium style. Observations are either the rendered
+# frame (a NumPy view of the frame surface, optionally downsampled and/or grayscale) or a compact feature
+# vector. VectorEnv steps several games in lockstep, in this process or in worker processes.
+#
+#   env = SpaceEnv(obs_type="features")
+#   obs, info = env.reset(seed=1)
+#   obs, reward, terminated, truncated, info = env.step(ACTION_SHOOT | ACTION_LEFT)
+#
+#   python space_env.py --envs 8 --mode subprocess --obs pixels --downsample 4 --grayscale   # steps per second
+import os  # OS module for environment variables
+import time  # for steps per second
+import argparse  # for command line options
+import multiprocessing  # for subprocess environments
+from multiprocessing import shared_memory  # for handing frames to the parent without copying through a pipe
+
+# Environments simulate without a window, video or sound
+os.environ["SPACE_DIDDLER_HEADLESS"] = "1"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np  # for observations
+import pygame  # for the frame surfaces
+import pyGame as game  # The game being wrapped
+
+# Actions are the replay input bytes: one bit per key, in Inputs field order
+ACTION_UP, ACTION_LEFT, ACTION_DOWN, ACTION_RIGHT, ACTION_BOOST, ACTION_SHOOT, ACTION_SUPER = (1 << bit for bit in range(7))
+NUM_ACTIONS = 128  # Every combination of the keys above (Enter does nothing in a game)
+
+ENEMY_SLOTS = 16  # Nearest enemies in the feature vector
+LASER_SLOTS = 16  # Nearest hostile lasers in the feature vector
+FEATURE_SIZE = 6 + 4 + 3 * ENEMY_SLOTS + 3 * LASER_SLOTS  # Player, boss, enemies, lasers
+
+
+# One game as an environment
+class SpaceEnv:
+    def __init__(self, obs_type="pixels", downsample=1, grayscale=False, frame_skip=1, max_ticks=None):
+        if obs_type not in ("pixels", "features"):
+            raise ValueError(f"obs_type must be 'pixels' or 'features', not {obs_type!r}")
+        self.obs_type = obs_type
+        self.downsample = downsample  # Keep every n-th pixel in both directions
+        self.grayscale = grayscale  # One luminance channel instead of RGB
+        self.frame_skip = frame_skip  # Ticks each action is held for
+        self.max_ticks = max_ticks  # Truncate episodes after this many ticks
+        self.world = game.make_world()  # Own lasers and enemies, so several environments can share a process
+        self.state = None
+
+        if obs_type == "pixels":
+            # Two frame surfaces, drawn alternately: a surface can't be drawn on while a NumPy view of it
+            # exists, and the caller usually still holds the previous observation during step()
+            self.surfaces = [pygame.Surface((game.WIDTH, game.HEIGHT)).convert() for _ in range(2)]
+            self.front = 0  # Surface of the latest observation
+            self.view = None  # View of the latest frame (released before that surface is drawn again)
+            self.background = game.ASSETS.image("BACKGROUND").convert()  # Opaque copy: blits without blending
+            width, height = len(range(0, game.WIDTH, downsample)), len(range(0, game.HEIGHT, downsample))
+            self.observation_shape = (width, height) if grayscale else (width, height, 3)
+            if grayscale:
+                self.gray_sum = np.zeros((width, height), dtype=np.uint16)  # Reused for the luminance sums
+                self.gray = np.zeros((width, height), dtype=np.uint8)
+        else:
+            self.observation_shape = (FEATURE_SIZE,)
+            self.features = np.zeros(FEATURE_SIZE, dtype=np.float32)  # Reused for every observation
+
+    def reset(self, seed=None):
+        """Start a new game and return (observation, info)."""
+        game.use_world(self.world)
+        self.state = game.GameState(seed)
+        return self.observe(), self.info()
+
+    def step(self, action):
+        """Hold action (an input byte or an Inputs tuple) for frame_skip ticks.
+
+        Returns (observation, reward, terminated, truncated, info). The reward is the score gained;
+        the episode terminates when the player loses, without waiting for the game over screen.
+        """
+        game.use_world(self.world)
+        state = self.state
+        inputs = game.INPUTS_BY_BYTE[action] if isinstance(action, (int, np.integer)) else action
+        score = state.score
+        for _ in range(self.frame_skip):
+            state.step(inputs)
+            if state.lost:
+                break
+        truncated = self.max_ticks is not None and state.tick >= self.max_ticks
+        return self.observe(), float(state.score - score), state.lost, truncated and not state.lost, self.info()
+
+    def info(self):
+        state = self.state
+        return {"tick": state.tick, "level": state.level, "score": state.score, "lives": state.lives}
+
+    def observe(self):
+        if self.obs_type == "features":
+            return self.feature_vector()
+        return self.frame()
+
+    def frame(self):
+        """Draw the game and return a NumPy view of the frame, shaped (width, height[, 3]).
+
+        The view shares memory with the frame surface: it stays valid until the step after next,
+        so copy it to keep it longer.
+        """
+        self.front = 1 - self.front
+        surface = self.surfaces[self.front]
+        game.draw_game(surface, self.state, self.background)
+        self.view = pygame.surfarray.pixels3d(surface)  # Zero-copy view of the pixels
+        view = self.view[::self.downsample, ::self.downsample] if self.downsample > 1 else self.view  # Still a view
+        if not self.grayscale:
+            return view
+        np.multiply(view[..., 0], 77, out=self.gray_sum, dtype=np.uint16)  # Integer luminance weights (sum to 256)
+        self.gray_sum += view[..., 1] * np.uint16(150)
+        self.gray_sum += view[..., 2] * np.uint16(29)
+        np.right_shift(self.gray_sum, 8, out=self.gray_sum)
+        self.gray[...] = self.gray_sum
+        return self.gray
+
+    def feature_vector(self):
+        """Return player, boss, nearest enemy and nearest hostile laser positions as float32 (relative to the player)."""
+        state = self.state
+        player = state.player
+        features = self.features
+        features[:] = 0
+        width, height = game.WIDTH, game.HEIGHT
+        features[0:6] = (player.x / width, player.y / height, player.health / player.max_health,
+                         player.fuel / player.max_fuel, state.lives / 10, player.super_move_ready)
+        if state.boss_spawned:
+            boss = state.boss
+            features[6:10] = (1, (boss.x - player.x) / width, (boss.y - player.y) / height, boss.health / boss.max_health)
+
+        offset = 10
+        for store, slots, hostile in ((self.world.enemies, ENEMY_SLOTS, None), (self.world.projectiles, LASER_SLOTS, game.OWNER_PLAYER)):
+            n = store.count
+            rows = store.alive[:n] if hostile is None else store.alive[:n] & (store.owner[:n] != hostile)
+            dx = (store.x[:n][rows] - player.x) / width
+            dy = (store.y[:n][rows] - player.y) / height
+            nearest = np.argsort(dx * dx + dy * dy)[:slots]  # Closest first
+            block = features[offset:offset + 3 * slots].reshape(slots, 3)
+            block[:len(nearest), 0] = dx[nearest]
+            block[:len(nearest), 1] = dy[nearest]
+            block[:len(nearest), 2] = 1  # Slot in use
+            offset += 3 * slots
+        return features
+
+    def close(self):
+        self.view = None
+        self.world.clear()
+
+
+# Worker process running one environment, writing its observations into shared memory
+def env_worker(connection, memory_name, index, env_kwargs):
+    env = SpaceEnv(**env_kwargs)
+    memory = shared_memory.SharedMemory(name=memory_name)
+    dtype = np.float32 if env.obs_type == "features" else np.uint8
+    batch = np.ndarray((index + 1,) + env.observation_shape, dtype=dtype, buffer=memory.buf)  # Rows up to ours
+    try:
+        while True:
+            command, argument = connection.recv()
+            if command == "reset":
+                obs, info = env.reset(argument)
+                batch[index] = obs
+                connection.send(info)
+            elif command == "step":
+                obs, reward, terminated, truncated, info = env.step(argument)
+                if terminated or truncated:  # Start the next episode right away, keeping the last info
+                    info["final_score"] = info["score"]
+                    obs, _ = env.reset()
+                batch[index] = obs
+                connection.send((reward, terminated, truncated, info))
+            elif command == "close":
+                break
+    finally:
+        del batch
+        env.close()
+        memory.close()
+        connection.close()
+
+
+# Several environments stepped in lockstep, returning batched observations
+class VectorEnv:
+    def __init__(self, num_envs, mode="inprocess", **env_kwargs):
+        if mode not in ("inprocess", "subprocess"):
+            raise ValueError(f"mode must be 'inprocess' or 'subprocess', not {mode!r}")
+        self.num_envs = num_envs
+        self.mode = mode
+        self.steps = 0  # Environment steps taken (one per environment per step() call)
+        self.step_time = 0.0  # Seconds spent in step()
+
+        probe = SpaceEnv(**env_kwargs)  # For the observation shape and type
+        dtype = np.float32 if probe.obs_type == "features" else np.uint8
+        shape = (num_envs,) + probe.observation_shape
+        probe.close()
+
+        if mode == "inprocess":
+            self.envs = [SpaceEnv(**env_kwargs) for _ in range(num_envs)]
+            self.observations = np.zeros(shape, dtype=dtype)  # Filled in place every step
+        else:
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.observations = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf)  # Written by the workers
+            self.connections = []
+            self.processes = []
+            for index in range(num_envs):
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=env_worker, args=(child, self.memory.name, index, env_kwargs), daemon=True)
+                process.start()
+                self.connections.append(parent)
+                self.processes.append(process)
+
+    def reset(self, seeds=None):
+        """Start a game in every environment and return (observations, infos)."""
+        seeds = [None] * self.num_envs if seeds is None else seeds
+        if self.mode == "inprocess":
+            infos = []
+            for index, (env, seed) in enumerate(zip(self.envs, seeds)):
+                obs, info = env.reset(seed)
+                self.observations[index] = obs
+                infos.append(info)
+        else:
+            for connection, seed in zip(self.connections, seeds):
+                connection.send(("reset", seed))
+            infos = [connection.recv() for connection in self.connections]
+        return self.observations, infos
+
+    def step(self, actions):
+        """Step every environment with its action; finished games restart on their own.
+
+        Returns (observations, rewards, terminated, truncated, infos). The observations array is reused
+        by the next step.
+        """
+        start = time.perf_counter()
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        infos = []
+        if self.mode == "inprocess":
+            for index, (env, action) in enumerate(zip(self.envs, actions)):
+                obs, rewards[index], terminated[index], truncated[index], info = env.step(action)
+                if terminated[index] or truncated[index]:
+                    info["final_score"] = info["score"]
+                    obs, _ = env.reset()
+                self.observations[index] = obs
+                infos.append(info)
+        else:
+            for connection, action in zip(self.connections, actions):
+                connection.send(("step", int(action)))
+            for index, connection in enumerate(self.connections):
+                rewards[index], terminated[index], truncated[index], info = connection.recv()
+                infos.append(info)
+        self.step_time += time.perf_counter() - start
+        self.steps += self.num_envs
+        return self.observations, rewards, terminated, truncated, infos
+
+    def steps_per_second(self):
+        """Environment steps per second of time spent stepping."""
+        return self.steps / self.step_time if self.step_time else 0.0
+
+    def close(self):
+        if self.mode == "inprocess":
+            for env in self.envs:
+                env.close()
+            return
+        for connection in self.connections:
+            connection.send(("close", None))
+        for process in self.processes:
+            process.join()
+        del self.observations
+        self.memory.close()
+        self.memory.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure Space Diddler environment throughput with random actions")
+    parser.add_argument("--envs", type=int, default=4, help="environments stepped in lockstep")
+    parser.add_argument("--mode", choices=("inprocess", "subprocess"), default="inprocess")
+    parser.add_argument("--obs", choices=("pixels", "features"), default="features", help="observation type")
+    parser.add_argument("--downsample", type=int, default=1, help="keep every n-th pixel (pixel observations)")
+    parser.add_argument("--grayscale", action="store_true", help="one luminance channel (pixel observations)")
+    parser.add_argument("--frame-skip", type=int, default=1, help="ticks each action is held for")
+    parser.add_argument("--steps", type=int, default=1000, help="vector steps to run")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first environment")
+    args = parser.parse_args()
+
+    envs = VectorEnv(args.envs, args.mode, obs_type=args.obs, downsample=args.downsample,
+                     grayscale=args.grayscale, frame_skip=args.frame_skip)
+    observations, _ = envs.reset([args.seed + index for index in range(args.envs)])
+    rng = np.random.default_rng(args.seed)
+    episodes = 0
+    for _ in range(args.steps):
+        observations, rewards, terminated, truncated, infos = envs.step(rng.integers(0, NUM_ACTIONS, args.envs))
+        episodes += int(terminated.sum() + truncated.sum())
+    print(f"{args.envs} {args.mode} envs, {args.obs} observations {observations.shape[1:]}: "
+          f"{envs.steps_per_second():.0f} steps/s ({envs.steps_per_second() * args.frame_skip:.0f} ticks/s), "
+          f"{episodes} episodes finished")
+    envs.close()